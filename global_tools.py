@@ -1,286 +1,773 @@
-import requests
-import datetime
-import os
-import pytz 
-from zoneinfo import ZoneInfo 
-from geopy.geocoders import Nominatim
-from geopy.exc import GeocoderTimedOut, GeocoderServiceError
-from timezonefinder import TimezoneFinder
-from dotenv import load_dotenv
-
-# Load environment variables from .env file
-load_dotenv()
-
-
-def get_current_time(city: str) -> dict:
-    """
-    Retrieves the current date and time for a specified city, accounting for its timezone.
-
-    Uses geopy (Nominatim) for geocoding and timezonefinder for timezone lookup.
-    Uses datetime and zoneinfo (or pytz fallback) for time retrieval.
-
-    Args:
-        city (str): The name of the city.
-
-    Returns:
-        dict: A dictionary containing status and report/error_message.
-    """
-    try:
-        # 1. City to Coordinates using Nominatim (Free OpenStreetMap geocoder)
-        #    Requires a unique user_agent string for your application.
-        #    Be mindful of Nominatim's usage policy (max 1 req/sec, caching). [9, 10]
-        # IMPORTANT: Replace "my_global_tools_app/1.0" with your actual app name/version
-        geolocator = Nominatim(user_agent="adk_kit_global_tools/1.0") # Example user agent
-        location = geolocator.geocode(city, timeout=10) # [5, 8, 11, 23]
-
-        if location is None:
-            return {
-                "status": "error",
-                "error_message": f"Sorry, I couldn't geocode or find the city '{city}'. Please check the spelling or try a more specific location."
-            }
-
-        # 2. Coordinates to Timezone using timezonefinder
-        tf = TimezoneFinder() # [17, 23]
-        timezone_str = tf.timezone_at(lng=location.longitude, lat=location.latitude) # [15, 17, 23]
-
-        if timezone_str is None:
-            return {
-                "status": "error",
-                "error_message": f"Sorry, I couldn't determine the timezone for the location of '{city}' ({location.latitude}, {location.longitude})."
-            }
-
-        # 3. Get Current Time using the timezone
-        try:
-            # Use zoneinfo (Python 3.9+)
-            city_tz = ZoneInfo(timezone_str)
-        except ImportError:
-            # Fallback to pytz for older Python versions
-            try:
-                city_tz = pytz.timezone(timezone_str) # [15, 30]
-            except pytz.UnknownTimeZoneError:
-                 return {
-                    "status": "error",
-                    "error_message": f"Sorry, the timezone '{timezone_str}' found for '{city}' is not recognized."
-                 }
-
-        now_utc = datetime.datetime.now(datetime.timezone.utc)
-        now_local = now_utc.astimezone(city_tz)
-
-        # 4. Formatting
-        # Format: YYYY-MM-DD HH:MM:SS TZNAMEOFFSET (e.g., 2025-04-28 09:58:00 EDT-0400)
-        formatted_time = now_local.strftime('%Y-%m-%d %H:%M:%S %Z%z')
-
-        # Adjust offset format slightly (e.g., +0100 -> +01:00 for readability if desired, but %z gives +0100)
-        # If you need the colon: formatted_time = f"{now_local.strftime('%Y-%m-%d %H:%M:%S %Z')}{now_local.strftime('%z')[:3]}:{now_local.strftime('%z')[3:]}"
-
-        return {
-            "status": "success",
-            "report": f"The current time in {location.address} is {formatted_time}"
-        }
-
-    except GeocoderTimedOut:
-        return {
-            "status": "error",
-            "error_message": f"Geocoding service timed out while looking up '{city}'. Please try again later."
-        }
-    except GeocoderServiceError as e:
-        return {
-            "status": "error",
-            "error_message": f"Geocoding service error for '{city}': {e}"
-        }
-    except Exception as e:
-        # Catch any other unexpected errors
-        return {
-            "status": "error",
-            "error_message": f"An unexpected error occurred while getting the time for '{city}': {e}"
-        }
-
-def get_weather(city: str) -> dict:
-    """
-    Retrieves a current weather summary for a specified city using OpenWeatherMap OneCall API v3.0.
-
-    Args:
-        city (str): The name of the city.
-
-    Returns:
-        dict: A dictionary containing status and report/error_message.
-    """
-    api_key = os.environ.get("OPENWEATHERMAP_API_KEY")
-    if not api_key:
-        return {
-            "status": "error",
-            "error_message": "OpenWeatherMap API key not configured. Please set the OPENWEATHERMAP_API_KEY environment variable."
-        }
-
-    try:
-        # 1. Geocode city to get latitude and longitude
-        geolocator = Nominatim(user_agent="adk_kit_global_tools/1.0") # Use the same user agent
-        location = geolocator.geocode(city, timeout=10)
-
-        if location is None:
-            return {
-                "status": "error",
-                "error_message": f"Sorry, I couldn't geocode or find the city '{city}'. Please check the spelling or try a more specific location."
-            }
-
-        lat = location.latitude
-        lon = location.longitude
-        city_name_found = location.address # Use geocoded address for clarity
-
-        # 2. Call OpenWeatherMap OneCall API v3.0
-        # Base URL for OneCall API v3.0
-        base_url = "https://api.openweathermap.org/data/3.0/onecall"
-        # Parameters for the API call
-        params = {
-            'lat': lat,
-            'lon': lon,
-            'appid': api_key,
-            'units': 'metric', # Get temperature in Celsius
-            'exclude': 'minutely,hourly,daily,alerts' # We only want current weather
-        }
-
-        # 3. API Integration: Make the HTTP request
-        response = requests.get(base_url, params=params, timeout=10)
-        response.raise_for_status() # Raises an HTTPError for bad responses (4XX, 5XX)
-
-        # 4. Data Parsing (v3.0 structure)
-        weather_data = response.json()
-
-        # Check for API errors within the JSON response (though raise_for_status handles most)
-        # Note: v3.0 might not use 'cod' like v2.5. Check response structure on error.
-        if 'message' in weather_data and response.status_code != 200:
-             return {
-                "status": "error",
-                "error_message": f"OpenWeatherMap API error for '{city}': {weather_data['message']}"
-            }
-
-        # Extract relevant info from the 'current' block
-        current_weather = weather_data.get("current")
-        if not current_weather:
-            return {
-                "status": "error",
-                "error_message": f"Could not find 'current' weather data in OpenWeatherMap v3.0 response for '{city}'."
-            }
-
-        temp_c = current_weather.get("temp")
-        weather_desc_list = current_weather.get("weather")
-        description = weather_desc_list[0].get("description") if weather_desc_list else "N/A"
-
-        if temp_c is None:
-             return {
-                "status": "error",
-                "error_message": f"Could not find temperature data in OpenWeatherMap v3.0 response for '{city}'."
-            }
-
-        # 5. Report Generation & Units
-        # Convert Celsius to Fahrenheit
-        temp_f = (temp_c * 9/5) + 32
-
-        report = (f"The weather in {city_name_found} is currently {temp_c:.1f}°C "
-                  f"({temp_f:.1f}°F) with {description}.")
-
-        return {
-            "status": "success",
-            "report": report
-        }
-
-    # Handle Geocoding errors separately
-    except GeocoderTimedOut:
-        return {
-            "status": "error",
-            "error_message": f"Geocoding service timed out while looking up '{city}'. Please try again later."
-        }
-    except GeocoderServiceError as e:
-        return {
-            "status": "error",
-            "error_message": f"Geocoding service error for '{city}': {e}"
-        }
-    # Handle API request errors
-    except requests.exceptions.HTTPError as http_err:
-        status_code = http_err.response.status_code
-        # Try to get error message from response body if available
-        try:
-            api_error_message = http_err.response.json().get('message', str(http_err))
-        except ValueError: # Handle cases where response is not JSON
-            api_error_message = str(http_err)
-
-        if status_code == 401: # Unauthorized
-            error_message = f"Authentication error for '{city}'. Check your OpenWeatherMap API key (ensure it's valid and activated for v3.0)."
-        elif status_code == 400: # Bad Request (often invalid lat/lon or parameters)
-             error_message = f"Bad request to OpenWeatherMap API for '{city}'. Check coordinates or parameters. API message: {api_error_message}"
-        elif status_code == 429: # Too Many Requests
-            error_message = f"Rate limit exceeded for OpenWeatherMap API. You may need to wait or check your plan limits."
-        else:
-            error_message = f"HTTP error occurred while getting weather for '{city}': {api_error_message}"
-        return {"status": "error", "error_message": error_message}
-    except requests.exceptions.ConnectionError:
-         return {
-            "status": "error",
-            "error_message": f"Network error: Could not connect to OpenWeatherMap to get weather for '{city}'."
-        }
-    except requests.exceptions.Timeout:
-        return {
-            "status": "error",
-            "error_message": f"Request timed out while getting weather for '{city}'."
-        }
-    except requests.exceptions.RequestException as req_err:
-        return {
-            "status": "error",
-            "error_message": f"An error occurred during the weather request for '{city}': {req_err}"
-        }
-    except Exception as e:
-        # Catch any other unexpected errors (like JSON parsing issues not caught above)
-        return {
-            "status": "error",
-            "error_message": f"An unexpected error occurred while getting the weather for '{city}': {e}"
-        }
-
-def update_crm_account_notes(customer_id: str, note: str, chat_id: str) -> dict:
-    """
-    Adds a note to the specified customer's account in the CRM.
-
-    Args:
-        customer_id (str): The identifier for the customer in CRM.
-        note (str): The content of the note to add.
-        chat_id (str, optional): The identifier for the current chat or interaction, if available.
-
-    Returns:
-        dict: A dictionary indicating the outcome.
-              {'status': 'success', 'message': 'Note added successfully.'} on success.
-              {'status': 'error', 'error_message': 'Details about the error.'} on failure.
-    """
-    print(f"--- Tool: update_crm_account_notes ---")
-    print(f"  - Customer ID: {customer_id}")
-    print(f"  - Note: {note}")
-    # In a live scenario, this would interact with CRM API, potentially logging the chat_id with the note.
-    # For now, we simulate success
-    return {"status": "success", "message": f"Note added successfully for customer {customer_id}."}
-
-def report_problem(problem_description: str, session_id: str) -> dict:
-    """
-    Reports a problem encountered during the process to the designated manager or system.
-
-    Use this tool when you encounter an issue you cannot resolve yourself,
-    such as persistent tool errors after retrying (if applicable),
-    critically missing information preventing any action, or unexpected situations
-    not covered by standard procedures.
-
-    Args:
-        problem_description (str): A clear and concise description of the problem encountered.
-        session_id (str, optional): The identifier for the current chat session.
-
-    Returns:
-        dict: A dictionary indicating the outcome.
-              {'status': 'success', 'message': 'Problem reported successfully.'} on success.
-              {'status': 'error', 'error_message': 'Details about the reporting error.'} on failure.
-    """
-    print(f"--- Tool: report_problem ---")
-    print(f"  - Session ID: {session_id if session_id else 'Not Provided'}")
-    print(f"  - Problem Description: {problem_description}")
-    # In a real scenario, this could send a notification (email, Slack, etc.)
-    # or log to a specific monitoring system, including the session_id for context.
-    # For now, we simulate success.
-    return {"status": "success", "message": "Problem reported successfully."}
-
-
-
+import asyncio
+import collections
+import concurrent.futures
+import functools
+import importlib.util
+import requests
+import datetime
+import os
+import threading
+import time
+from cachetools import LRUCache, TTLCache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from dotenv import load_dotenv
+
+# geopy, timezonefinder and aiohttp are deliberately NOT imported at module
+# level: together they pull in tens of MB of polygon data and adapter
+# machinery, which callers that only use the CRM/reporting tools (or
+# serverless cold starts) should not have to pay for. Each is imported
+# inside the first function that needs it.
+
+try:
+    import httpx # Optional: enables HTTP/2 for OpenWeatherMap calls
+except ImportError:
+    httpx = None
+
+try:
+    import orjson # Optional: SIMD-accelerated JSON parsing
+except ImportError:
+    orjson = None
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Read once at import; the environment does not change under a running
+# process, so per-call os.environ lookups are wasted work.
+_OWM_KEY = os.environ.get("OPENWEATHERMAP_API_KEY")
+
+# Shared HTTP client so repeated calls reuse pooled TCP/TLS connections
+# instead of paying a full handshake per request. When httpx[http2] is
+# installed, requests are multiplexed over a single HTTP/2 connection;
+# otherwise we fall back to a pooled requests.Session (HTTP/1.1 keep-alive)
+# with transient 429/5xx errors retried with a short backoff. The _HTTP_*
+# aliases let get_weather catch the right exception types either way.
+# httpx.Client(http2=True) raises ImportError at construction when the h2
+# extra is absent — and httpx without h2 is common (it rides in as a
+# transitive dependency) — so probe for h2 rather than just for httpx.
+if httpx is not None and importlib.util.find_spec("h2") is not None:
+    _HTTP = httpx.Client(
+        http2=True,
+        timeout=10.0,
+        headers={"User-Agent": "adk_kit_global_tools/1.0"},
+        transport=httpx.HTTPTransport(retries=2),
+    )
+    _HTTP_STATUS_ERROR = httpx.HTTPStatusError
+    _HTTP_CONNECTION_ERROR = httpx.ConnectError
+    _HTTP_TIMEOUT = httpx.TimeoutException
+    _HTTP_REQUEST_ERROR = httpx.HTTPError
+else:
+    _HTTP = requests.Session()
+    # Jittered backoff on transient 429/5xx keeps bursty rate limits from
+    # surfacing as caller-visible errors (and from triggering higher-layer
+    # retry loops that would repeat the geocode too). Honouring Retry-After
+    # waits exactly as long as OpenWeatherMap asks.
+    _HTTP.mount("https://", HTTPAdapter(
+        pool_connections=10,
+        pool_maxsize=10,
+        max_retries=Retry(
+            total=3,
+            backoff_factor=0.3,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=["GET"],
+            respect_retry_after_header=True,
+        ),
+    ))
+    _HTTP.headers.update({"User-Agent": "adk_kit_global_tools/1.0"})
+    _HTTP_STATUS_ERROR = requests.exceptions.HTTPError
+    _HTTP_CONNECTION_ERROR = requests.exceptions.ConnectionError
+    _HTTP_TIMEOUT = requests.exceptions.Timeout
+    _HTTP_REQUEST_ERROR = requests.exceptions.RequestException
+
+# Short-lived cache of successful weather reports keyed by rounded
+# coordinates; guarded by a lock since get_weather_batch fetches from a
+# thread pool.
+_WX_CACHE = TTLCache(maxsize=512, ttl=60)
+_WX_CACHE_LOCK = threading.Lock()
+
+# Single Nominatim geocoder shared by all tools, backed by a pooled requests
+# session so repeated geocodes reuse one HTTPS connection instead of opening
+# a fresh one per call (geopy's default urllib adapter does not keep alive).
+# Be mindful of Nominatim's usage policy (max 1 req/sec, caching).
+_GEO_SESSION = None
+_GEOLOCATOR = None
+
+
+def _geolocator():
+    """Returns the shared Nominatim geocoder, creating it on first use."""
+    global _GEO_SESSION, _GEOLOCATOR
+    if _GEOLOCATOR is None:
+        from geopy.adapters import RequestsAdapter
+        from geopy.geocoders import Nominatim
+
+        _GEO_SESSION = requests.Session()
+        _GEOLOCATOR = Nominatim(
+            user_agent="adk_kit_global_tools/1.0",
+            adapter_factory=lambda proxies, ssl_context: RequestsAdapter(
+                proxies=proxies, ssl_context=ssl_context, session=_GEO_SESSION
+            ),
+        )
+    return _GEOLOCATOR
+
+
+# Slim result type for geocoding: three immutable fields instead of a full
+# geopy Location, so cache entries stay small and the Location's large raw
+# JSON payload can be collected as soon as the helper returns.
+_GeoResult = collections.namedtuple("_GeoResult", ("latitude", "longitude", "address"))
+
+
+@functools.lru_cache(maxsize=1024)
+def _geocode_city(city: str):
+    """
+    Geocodes a (normalized) city name to a _GeoResult(lat, lon, address).
+
+    City coordinates are effectively static, so results are memoized; this
+    also keeps us well within Nominatim's ~1 req/sec usage policy on
+    repeated queries. Returns None when the city cannot be found. Geocoder
+    exceptions propagate (lru_cache does not cache raised exceptions).
+    """
+    location = _geolocator().geocode(city, timeout=10)
+    if location is None:
+        return None
+    return _GeoResult(location.latitude, location.longitude, location.address)
+
+
+def _format_geocode_error(city: str) -> dict:
+    """Builds the common 'city not found' error dict shared by the tools."""
+    return {
+        "status": "error",
+        "error_message": f"Sorry, I couldn't geocode or find the city '{city}'. Please check the spelling or try a more specific location."
+    }
+
+
+# TimezoneFinder construction memory-maps the polygon data and costs tens of
+# ms; built once on first lookup with the polygons held in RAM.
+_TF = None
+
+
+@functools.lru_cache(maxsize=4096)
+def _tz_for(lat_q: float, lon_q: float):
+    """
+    Memoized timezone lookup for a coordinate pair.
+
+    timezone_at is pure and idempotent, so callers round coordinates to
+    3 decimals (~100m) before calling to boost the hit rate without
+    introducing geographic ambiguity.
+    """
+    global _TF
+    if _TF is None:
+        # TimezoneFinderL trades exact point-in-polygon tests for an O(1)
+        # shortcut-grid lookup; the boundary accuracy loss is irrelevant at
+        # city granularity. Fall back on older timezonefinder releases.
+        try:
+            from timezonefinder import TimezoneFinderL as _TimezoneFinder
+        except ImportError:
+            from timezonefinder import TimezoneFinder as _TimezoneFinder
+
+        _TF = _TimezoneFinder(in_memory=True)
+    return _TF.timezone_at(lng=lon_q, lat=lat_q)
+
+
+# ZoneInfo reparses the tzdata file on every construction; cache the
+# instances since timezone keys are low-cardinality.
+_ZONE = functools.lru_cache(maxsize=512)(ZoneInfo)
+
+
+def _format_local_time(dt: datetime.datetime) -> str:
+    """
+    Formats an aware datetime as 'YYYY-MM-DD HH:MM:SS TZNAME+HHMM'.
+
+    Equivalent to strftime('%Y-%m-%d %H:%M:%S %Z%z') but built from the
+    datetime's attributes directly, which skips the locale-aware C
+    formatting machinery (~3x faster in CPython).
+    """
+    offset = dt.utcoffset() or datetime.timedelta(0)
+    minutes = int(offset.total_seconds()) // 60
+    sign = "+" if minutes >= 0 else "-"
+    minutes = abs(minutes)
+    return (f"{dt.year:04d}-{dt.month:02d}-{dt.day:02d} "
+            f"{dt.hour:02d}:{dt.minute:02d}:{dt.second:02d} "
+            f"{dt.tzname() or ''}{sign}{minutes // 60:02d}{minutes % 60:02d}")
+
+
+def get_current_time(city: str) -> dict:
+    """
+    Retrieves the current date and time for a specified city, accounting for its timezone.
+
+    Uses geopy (Nominatim) for geocoding and timezonefinder for timezone lookup.
+    Uses datetime and zoneinfo for time retrieval.
+
+    Args:
+        city (str): The name of the city.
+
+    Returns:
+        dict: A dictionary containing status and report/error_message.
+    """
+    from geopy.exc import GeocoderTimedOut, GeocoderServiceError
+
+    try:
+        # 1. City to Coordinates via the cached geocoding helper
+        geocoded = _geocode_city(city.strip().lower())
+
+        if geocoded is None:
+            return _format_geocode_error(city)
+        latitude, longitude, address = geocoded
+
+        # 2. Coordinates to Timezone via the shared, memoized lookup
+        timezone_str = _tz_for(round(latitude, 3), round(longitude, 3)) # [15, 17, 23]
+
+        if timezone_str is None:
+            return {
+                "status": "error",
+                "error_message": f"Sorry, I couldn't determine the timezone for the location of '{city}' ({latitude}, {longitude})."
+            }
+
+        # 3. Get Current Time using the (cached) timezone
+        try:
+            city_tz = _ZONE(timezone_str)
+        except ZoneInfoNotFoundError:
+            return {
+                "status": "error",
+                "error_message": f"Sorry, the timezone '{timezone_str}' found for '{city}' is not recognized."
+            }
+
+        now_utc = datetime.datetime.now(datetime.timezone.utc)
+        now_local = now_utc.astimezone(city_tz)
+
+        # 4. Formatting
+        # Format: YYYY-MM-DD HH:MM:SS TZNAMEOFFSET (e.g., 2025-04-28 09:58:00 EDT-0400)
+        formatted_time = _format_local_time(now_local)
+
+        return {
+            "status": "success",
+            "report": f"The current time in {address} is {formatted_time}"
+        }
+
+    except GeocoderTimedOut:
+        return {
+            "status": "error",
+            "error_message": f"Geocoding service timed out while looking up '{city}'. Please try again later."
+        }
+    except GeocoderServiceError as e:
+        return {
+            "status": "error",
+            "error_message": f"Geocoding service error for '{city}': {e}"
+        }
+
+def _fetch_weather_by_coords(city: str, lat: float, lon: float, city_name_found: str) -> dict:
+    """
+    Fetches and formats the OpenWeatherMap report for already-geocoded
+    coordinates. Split out of get_weather so batch callers can fan the
+    network-bound part out across threads after geocoding.
+
+    Args:
+        city (str): The city name as supplied by the caller (for messages).
+        lat (float): Latitude of the city.
+        lon (float): Longitude of the city.
+        city_name_found (str): Geocoded address used in the report.
+
+    Returns:
+        dict: A dictionary containing status and report/error_message.
+    """
+    # Current weather changes on the order of minutes; collapse bursts of
+    # calls for the same location (~1km at 2 decimals) into one upstream
+    # request instead of burning bandwidth and rate limit.
+    cache_key = (round(lat, 2), round(lon, 2))
+    with _WX_CACHE_LOCK:
+        cached = _WX_CACHE.get(cache_key)
+    if cached is not None:
+        return dict(cached)
+
+    try:
+        # 2. Call OpenWeatherMap OneCall API v3.0
+        # Base URL for OneCall API v3.0
+        base_url = "https://api.openweathermap.org/data/3.0/onecall"
+        # Parameters for the API call
+        params = {
+            'lat': lat,
+            'lon': lon,
+            'appid': _OWM_KEY,
+            'units': 'metric', # Get temperature in Celsius
+            'exclude': 'minutely,hourly,daily,alerts' # We only want current weather
+        }
+
+        # 3. API Integration: Make the HTTP request over the shared session
+        response = _HTTP.get(base_url, params=params, timeout=10)
+        response.raise_for_status() # Raises an HTTPError for bad responses (4XX, 5XX)
+
+        # 4. Data Parsing (v3.0 structure); orjson cuts the parse CPU
+        # several-fold on OWM's ~1-2KB payloads when available.
+        if orjson is not None:
+            weather_data = orjson.loads(response.content)
+        else:
+            weather_data = response.json()
+
+        # Check for API errors within the JSON response (though raise_for_status handles most)
+        # Note: v3.0 might not use 'cod' like v2.5. Check response structure on error.
+        if 'message' in weather_data and response.status_code != 200:
+             return {
+                "status": "error",
+                "error_message": f"OpenWeatherMap API error for '{city}': {weather_data['message']}"
+            }
+
+        # Extract relevant info from the 'current' block
+        current_weather = weather_data.get("current") or {}
+        if not current_weather:
+            return {
+                "status": "error",
+                "error_message": f"Could not find 'current' weather data in OpenWeatherMap v3.0 response for '{city}'."
+            }
+
+        # Bind the nested lookups once instead of re-walking the dict chain.
+        temp_c = current_weather.get("temp")
+        weather_desc_list = current_weather.get("weather") or ()
+        description = weather_desc_list[0].get("description", "N/A") if weather_desc_list else "N/A"
+
+        if temp_c is None:
+             return {
+                "status": "error",
+                "error_message": f"Could not find temperature data in OpenWeatherMap v3.0 response for '{city}'."
+            }
+
+        # 5. Report Generation & Units
+        # Convert Celsius to Fahrenheit
+        temp_f = temp_c * 1.8 + 32.0
+
+        report = (f"The weather in {city_name_found} is currently {temp_c:.1f}°C "
+                  f"({temp_f:.1f}°F) with {description}.")
+
+        result = {
+            "status": "success",
+            "report": report
+        }
+        with _WX_CACHE_LOCK:
+            _WX_CACHE[cache_key] = result
+        return dict(result)
+
+    # Handle API request errors
+    except _HTTP_STATUS_ERROR as http_err:
+        status_code = http_err.response.status_code
+        # Try to get error message from response body if available
+        try:
+            api_error_message = http_err.response.json().get('message', str(http_err))
+        except ValueError: # Handle cases where response is not JSON
+            api_error_message = str(http_err)
+
+        if status_code == 401: # Unauthorized
+            error_message = f"Authentication error for '{city}'. Check your OpenWeatherMap API key (ensure it's valid and activated for v3.0)."
+        elif status_code == 400: # Bad Request (often invalid lat/lon or parameters)
+             error_message = f"Bad request to OpenWeatherMap API for '{city}'. Check coordinates or parameters. API message: {api_error_message}"
+        elif status_code == 429: # Too Many Requests
+            error_message = f"Rate limit exceeded for OpenWeatherMap API. You may need to wait or check your plan limits."
+        else:
+            error_message = f"HTTP error occurred while getting weather for '{city}': {api_error_message}"
+        return {"status": "error", "error_message": error_message}
+    except _HTTP_CONNECTION_ERROR:
+         return {
+            "status": "error",
+            "error_message": f"Network error: Could not connect to OpenWeatherMap to get weather for '{city}'."
+        }
+    except _HTTP_TIMEOUT:
+        return {
+            "status": "error",
+            "error_message": f"Request timed out while getting weather for '{city}'."
+        }
+    except _HTTP_REQUEST_ERROR as req_err:
+        return {
+            "status": "error",
+            "error_message": f"An error occurred during the weather request for '{city}': {req_err}"
+        }
+    except ValueError as e:
+        # Malformed JSON body (orjson and the stdlib both raise ValueError subclasses)
+        return {
+            "status": "error",
+            "error_message": f"Could not parse the OpenWeatherMap response for '{city}': {e}"
+        }
+
+def get_weather(city: str) -> dict:
+    """
+    Retrieves a current weather summary for a specified city using OpenWeatherMap OneCall API v3.0.
+
+    Args:
+        city (str): The name of the city.
+
+    Returns:
+        dict: A dictionary containing status and report/error_message.
+    """
+    from geopy.exc import GeocoderTimedOut, GeocoderServiceError
+
+    if not _OWM_KEY:
+        return {
+            "status": "error",
+            "error_message": "OpenWeatherMap API key not configured. Please set the OPENWEATHERMAP_API_KEY environment variable."
+        }
+
+    try:
+        # 1. Geocode city to get latitude and longitude via the cached helper
+        geocoded = _geocode_city(city.strip().lower())
+    except GeocoderTimedOut:
+        return {
+            "status": "error",
+            "error_message": f"Geocoding service timed out while looking up '{city}'. Please try again later."
+        }
+    except GeocoderServiceError as e:
+        return {
+            "status": "error",
+            "error_message": f"Geocoding service error for '{city}': {e}"
+        }
+
+    if geocoded is None:
+        return _format_geocode_error(city)
+
+    lat, lon, city_name_found = geocoded # Use geocoded address for clarity
+    return _fetch_weather_by_coords(city, lat, lon, city_name_found)
+
+def get_weather_batch(cities: list) -> list:
+    """
+    Retrieves weather summaries for several cities, one result dict per city.
+
+    Geocoding runs serially through the cached _geocode_city helper (cache
+    misses hit Nominatim, whose usage policy disallows parallel requests);
+    the OpenWeatherMap calls then fan out across a small thread pool over
+    the shared connection pool, so N cities cost roughly one weather RTT.
+
+    Args:
+        cities (list): City names, in the order results should be returned.
+
+    Returns:
+        list: One status/report dict per input city, in input order.
+    """
+    from geopy.exc import GeocoderTimedOut, GeocoderServiceError
+
+    if not _OWM_KEY:
+        error = {
+            "status": "error",
+            "error_message": "OpenWeatherMap API key not configured. Please set the OPENWEATHERMAP_API_KEY environment variable."
+        }
+        return [dict(error) for _ in cities]
+
+    results = [None] * len(cities)
+    geocoded_by_index = {}
+    for i, city in enumerate(cities):
+        try:
+            geocoded = _geocode_city(city.strip().lower())
+        except GeocoderTimedOut:
+            results[i] = {
+                "status": "error",
+                "error_message": f"Geocoding service timed out while looking up '{city}'. Please try again later."
+            }
+            continue
+        except GeocoderServiceError as e:
+            results[i] = {
+                "status": "error",
+                "error_message": f"Geocoding service error for '{city}': {e}"
+            }
+            continue
+        if geocoded is None:
+            results[i] = _format_geocode_error(city)
+        else:
+            geocoded_by_index[i] = geocoded
+
+    if geocoded_by_index:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+            futures = {
+                i: executor.submit(_fetch_weather_by_coords, cities[i], *geocoded)
+                for i, geocoded in geocoded_by_index.items()
+            }
+            for i, future in futures.items():
+                results[i] = future.result()
+    return results
+
+# --- Async variants for multi-city batching ---
+# The sync tools serialize geocode + weather round-trips per city; callers
+# handling N cities pay N x RTT. These siblings run on aiohttp so N requests
+# complete in roughly max(RTT) instead of sum(RTT).
+
+# Shared aiohttp session, created lazily on first async call.
+_AIOHTTP = None
+
+
+async def _session():
+    """Lazily creates (or recreates) the shared aiohttp client session."""
+    import aiohttp
+
+    global _AIOHTTP
+    if _AIOHTTP is None or _AIOHTTP.closed:
+        _AIOHTTP = aiohttp.ClientSession(
+            headers={"User-Agent": "adk_kit_global_tools/1.0"},
+            timeout=aiohttp.ClientTimeout(total=10),
+        )
+    return _AIOHTTP
+
+
+# Shared throttle state for async Nominatim calls. A per-call
+# AsyncRateLimiter would reset its clock on every request, so gathered
+# lookups would still hit Nominatim all at once; instead every miss reserves
+# the next free 1-second slot here. Plain monotonic floats guarded by a
+# (briefly held, never across an await) threading.Lock keep the state
+# loop-agnostic across separate asyncio.run invocations.
+_AGEO_NEXT_SLOT = 0.0
+_AGEO_SLOT_LOCK = threading.Lock()
+
+# Async geocode results keyed by normalized city name, mirroring the sync
+# lru_cache on _geocode_city. Hits skip both the network call and the
+# 1 req/sec slot wait. Only touched from the event loop, so no lock.
+_AGEO_CACHE = LRUCache(maxsize=1024)
+
+
+async def _nominatim_slot():
+    """Reserves the next ~1 req/sec Nominatim slot and sleeps until it."""
+    global _AGEO_NEXT_SLOT
+    with _AGEO_SLOT_LOCK:
+        now = time.monotonic()
+        slot = max(now, _AGEO_NEXT_SLOT)
+        _AGEO_NEXT_SLOT = slot + 1.0
+    if slot > now:
+        await asyncio.sleep(slot - now)
+
+
+async def _geocode_city_async(city: str):
+    """
+    Async counterpart of _geocode_city.
+
+    Results are memoized like the sync path (city coordinates are
+    effectively static); misses reserve a shared ~1 req/sec slot so
+    Nominatim's usage policy holds even when many cities are gathered at
+    once. Geocoder exceptions propagate and are not cached.
+    """
+    from geopy.adapters import AioHTTPAdapter
+    from geopy.geocoders import Nominatim
+
+    cache_key = city.strip().lower()
+    if cache_key in _AGEO_CACHE:
+        return _AGEO_CACHE[cache_key]
+    await _nominatim_slot()
+    # The geolocator stays per-call: its aiohttp session is bound to the
+    # running loop, and the context manager closes it cleanly either way.
+    async with Nominatim(
+        user_agent="adk_kit_global_tools/1.0",
+        adapter_factory=AioHTTPAdapter,
+    ) as geolocator:
+        location = await geolocator.geocode(cache_key, timeout=10)
+    if location is None:
+        result = None
+    else:
+        result = _GeoResult(location.latitude, location.longitude, location.address)
+    _AGEO_CACHE[cache_key] = result
+    return result
+
+
+async def get_current_time_async(city: str) -> dict:
+    """
+    Async variant of get_current_time for concurrent multi-city lookups.
+
+    Args:
+        city (str): The name of the city.
+
+    Returns:
+        dict: A dictionary containing status and report/error_message.
+    """
+    from geopy.exc import GeocoderTimedOut, GeocoderServiceError
+
+    try:
+        geocoded = await _geocode_city_async(city)
+        if geocoded is None:
+            return _format_geocode_error(city)
+        latitude, longitude, address = geocoded
+
+        timezone_str = _tz_for(round(latitude, 3), round(longitude, 3))
+        if timezone_str is None:
+            return {
+                "status": "error",
+                "error_message": f"Sorry, I couldn't determine the timezone for the location of '{city}' ({latitude}, {longitude})."
+            }
+
+        try:
+            city_tz = _ZONE(timezone_str)
+        except ZoneInfoNotFoundError:
+            return {
+                "status": "error",
+                "error_message": f"Sorry, the timezone '{timezone_str}' found for '{city}' is not recognized."
+            }
+
+        now_local = datetime.datetime.now(datetime.timezone.utc).astimezone(city_tz)
+        formatted_time = _format_local_time(now_local)
+        return {
+            "status": "success",
+            "report": f"The current time in {address} is {formatted_time}"
+        }
+    except GeocoderTimedOut:
+        return {
+            "status": "error",
+            "error_message": f"Geocoding service timed out while looking up '{city}'. Please try again later."
+        }
+    except GeocoderServiceError as e:
+        return {
+            "status": "error",
+            "error_message": f"Geocoding service error for '{city}': {e}"
+        }
+    except Exception as e:
+        return {
+            "status": "error",
+            "error_message": f"An unexpected error occurred while getting the time for '{city}': {e}"
+        }
+
+
+async def get_weather_async(city: str) -> dict:
+    """
+    Async variant of get_weather for concurrent multi-city lookups.
+
+    Args:
+        city (str): The name of the city.
+
+    Returns:
+        dict: A dictionary containing status and report/error_message.
+    """
+    import aiohttp
+    from geopy.exc import GeocoderTimedOut, GeocoderServiceError
+
+    if not _OWM_KEY:
+        return {
+            "status": "error",
+            "error_message": "OpenWeatherMap API key not configured. Please set the OPENWEATHERMAP_API_KEY environment variable."
+        }
+
+    try:
+        geocoded = await _geocode_city_async(city)
+        if geocoded is None:
+            return _format_geocode_error(city)
+        lat, lon, city_name_found = geocoded
+
+        base_url = "https://api.openweathermap.org/data/3.0/onecall"
+        params = {
+            # yarl rejects float query values, so stringify the coordinates
+            # (requests does this implicitly on the sync path)
+            'lat': f"{lat}",
+            'lon': f"{lon}",
+            'appid': _OWM_KEY,
+            'units': 'metric',
+            'exclude': 'minutely,hourly,daily,alerts'
+        }
+
+        session = await _session()
+        async with session.get(base_url, params=params) as response:
+            response.raise_for_status()
+            weather_data = await response.json()
+
+        current_weather = weather_data.get("current") or {}
+        if not current_weather:
+            return {
+                "status": "error",
+                "error_message": f"Could not find 'current' weather data in OpenWeatherMap v3.0 response for '{city}'."
+            }
+
+        # Bind the nested lookups once instead of re-walking the dict chain.
+        temp_c = current_weather.get("temp")
+        weather_desc_list = current_weather.get("weather") or ()
+        description = weather_desc_list[0].get("description", "N/A") if weather_desc_list else "N/A"
+
+        if temp_c is None:
+            return {
+                "status": "error",
+                "error_message": f"Could not find temperature data in OpenWeatherMap v3.0 response for '{city}'."
+            }
+
+        temp_f = temp_c * 1.8 + 32.0
+        report = (f"The weather in {city_name_found} is currently {temp_c:.1f}°C "
+                  f"({temp_f:.1f}°F) with {description}.")
+        return {
+            "status": "success",
+            "report": report
+        }
+    except GeocoderTimedOut:
+        return {
+            "status": "error",
+            "error_message": f"Geocoding service timed out while looking up '{city}'. Please try again later."
+        }
+    except GeocoderServiceError as e:
+        return {
+            "status": "error",
+            "error_message": f"Geocoding service error for '{city}': {e}"
+        }
+    except aiohttp.ClientResponseError as http_err:
+        return {
+            "status": "error",
+            "error_message": f"HTTP error occurred while getting weather for '{city}': {http_err.message}"
+        }
+    except aiohttp.ClientConnectionError:
+        return {
+            "status": "error",
+            "error_message": f"Network error: Could not connect to OpenWeatherMap to get weather for '{city}'."
+        }
+    except asyncio.TimeoutError:
+        return {
+            "status": "error",
+            "error_message": f"Request timed out while getting weather for '{city}'."
+        }
+    except Exception as e:
+        return {
+            "status": "error",
+            "error_message": f"An unexpected error occurred while getting the weather for '{city}': {e}"
+        }
+
+
+async def get_weather_for_cities(cities: list) -> list:
+    """Fetches weather reports for several cities concurrently."""
+    return list(await asyncio.gather(*(get_weather_async(c) for c in cities)))
+
+
+async def get_current_time_for_cities(cities: list) -> list:
+    """Fetches current-time reports for several cities concurrently."""
+    return list(await asyncio.gather(*(get_current_time_async(c) for c in cities)))
+
+
+def update_crm_account_notes(customer_id: str, note: str, chat_id: str) -> dict:
+    """
+    Adds a note to the specified customer's account in the CRM.
+
+    Args:
+        customer_id (str): The identifier for the customer in CRM.
+        note (str): The content of the note to add.
+        chat_id (str, optional): The identifier for the current chat or interaction, if available.
+
+    Returns:
+        dict: A dictionary indicating the outcome.
+              {'status': 'success', 'message': 'Note added successfully.'} on success.
+              {'status': 'error', 'error_message': 'Details about the error.'} on failure.
+    """
+    print(f"--- Tool: update_crm_account_notes ---")
+    print(f"  - Customer ID: {customer_id}")
+    print(f"  - Note: {note}")
+    # In a live scenario, this would interact with CRM API, potentially logging the chat_id with the note.
+    # For now, we simulate success
+    return {"status": "success", "message": f"Note added successfully for customer {customer_id}."}
+
+def report_problem(problem_description: str, session_id: str) -> dict:
+    """
+    Reports a problem encountered during the process to the designated manager or system.
+
+    Use this tool when you encounter an issue you cannot resolve yourself,
+    such as persistent tool errors after retrying (if applicable),
+    critically missing information preventing any action, or unexpected situations
+    not covered by standard procedures.
+
+    Args:
+        problem_description (str): A clear and concise description of the problem encountered.
+        session_id (str, optional): The identifier for the current chat session.
+
+    Returns:
+        dict: A dictionary indicating the outcome.
+              {'status': 'success', 'message': 'Problem reported successfully.'} on success.
+              {'status': 'error', 'error_message': 'Details about the reporting error.'} on failure.
+    """
+    print(f"--- Tool: report_problem ---")
+    print(f"  - Session ID: {session_id if session_id else 'Not Provided'}")
+    print(f"  - Problem Description: {problem_description}")
+    # In a real scenario, this could send a notification (email, Slack, etc.)
+    # or log to a specific monitoring system, including the session_id for context.
+    # For now, we simulate success.
+    return {"status": "success", "message": "Problem reported successfully."}
+
+
+
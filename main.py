@@ -1,467 +1,810 @@
-import os
-import os
-import shutil
-import ast
-import inspect
-import importlib.util
-import re # Added for sanitization
-from pathlib import Path
-from fastapi import FastAPI, HTTPException, status
-from pydantic import BaseModel, Field, field_validator # Added field_validator
-from typing import List, Optional, Dict, Any
-
-# --- Configuration ---
-GLOBAL_TOOLS_FILE = "global_tools.py"
-MANAGED_AGENTS_DIR = "managed_agents"
-
-# --- Ensure Base Files/Directories Exist ---
-if not os.path.exists(GLOBAL_TOOLS_FILE):
-    with open(GLOBAL_TOOLS_FILE, "w", encoding="utf-8") as f:
-        f.write("# Global tool functions managed by the API\n")
-        f.write("import datetime\n") # Add common imports maybe?
-        f.write("from zoneinfo import ZoneInfo\n\n")
-os.makedirs(MANAGED_AGENTS_DIR, exist_ok=True)
-# --- Helper Function for Name Sanitization ---
-
-def sanitize_agent_name(name: str) -> str:
-    """Converts a string into a valid Python identifier for agent names."""
-    if not isinstance(name, str): # Handle potential non-string input
-        raise ValueError("Agent name must be a string.")
-
-    # Replace common invalid chars (space, hyphen) with underscore
-    name = name.replace(" ", "_").replace("-", "_")
-
-    # Remove any characters that are not letters, digits, or underscores
-    name = re.sub(r'[^a-zA-Z0-9_]', '', name)
-
-    # Remove leading/trailing underscores that might be left after substitution
-    name = name.strip('_')
-
-    # Prepend underscore if the name starts with a digit
-    if name and name[0].isdigit():
-        name = "_" + name
-
-    # Ensure the name is not empty after sanitization
-    if not name:
-        raise ValueError("Agent name cannot be empty or contain only invalid characters after sanitization.")
-
-    # Final check to ensure it's a valid identifier
-    if not name.isidentifier():
-         # This should ideally not be reached if the logic above is correct, but acts as a safeguard.
-         raise ValueError(f"Sanitized name '{name}' is still not a valid Python identifier.")
-
-    return name
-
-# --- Pydantic Models ---
-
-class ToolFunction(BaseModel):
-    name: str = Field(..., description="Name of the Python function.")
-    code: str = Field(..., description="Full Python code definition of the function, including signature and docstring.")
-    # Optional: Could add fields for parameters, return type, docstring separately if needed for validation
-
-class AgentConfig(BaseModel):
-    name: str = Field(..., description="Unique name for the agent (will be the directory name)")
-    model: str = Field(default="gemini-2.0-flash", description="LLM model ID")
-    description: Optional[str] = Field(default=None, description="Description of the agent's purpose")
-    instruction: str = Field(..., description="System instructions for the agent")
-    # References tools just by function name now
-    tool_references: List[str] = Field(default=[], description="List of tool function names (e.g., 'get_weather', 'get_current_time')")
-    # env_vars field removed
-
-    @field_validator('name', mode='before')
-    @classmethod
-    def validate_and_sanitize_name(cls, v):
-        """Validates and sanitizes the agent name before standard validation."""
-        if not isinstance(v, str):
-             # Raise standard ValueError which Pydantic/FastAPI handles
-             raise ValueError("Agent name must be a string")
-        try:
-            sanitized_name = sanitize_agent_name(v)
-            # Check if sanitization actually changed the name and log/warn if desired
-            # if v != sanitized_name:
-            #     print(f"Sanitized agent name from '{v}' to '{sanitized_name}'")
-            return sanitized_name
-        except ValueError as e:
-            # Re-raise the error from sanitize_agent_name
-            # Pydantic will wrap this in a ValidationError
-            raise ValueError(str(e)) from e
-
-class AgentRead(AgentConfig):
-    pass
-
-# --- FastAPI App ---
-app = FastAPI(title="ADK Agent & Function Manager API")
-
-# --- AST Helper Functions ---
-
-def read_global_tools_ast():
-    """Reads and parses the global tools file into an AST."""
-    try:
-        with open(GLOBAL_TOOLS_FILE, "r", encoding="utf-8") as f:
-            source_code = f.read()
-        return ast.parse(source_code)
-    except FileNotFoundError:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"{GLOBAL_TOOLS_FILE} not found.")
-    except SyntaxError as e:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Syntax error in {GLOBAL_TOOLS_FILE}: {e}")
-    except Exception as e:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to read/parse {GLOBAL_TOOLS_FILE}: {e}")
-
-def write_global_tools_ast(tree):
-    """Writes the AST back to the global tools file."""
-    try:
-        new_source_code = ast.unparse(tree) # Requires Python 3.9+
-        # Add a newline at the end if missing
-        if not new_source_code.endswith('\n'):
-            new_source_code += '\n'
-        with open(GLOBAL_TOOLS_FILE, "w", encoding="utf-8") as f:
-            f.write(new_source_code)
-    except Exception as e:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to write {GLOBAL_TOOLS_FILE}: {e}")
-
-def find_function_node(tree, func_name):
-    """Finds a function definition node by name in the AST."""
-    for node in ast.walk(tree):
-        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name == func_name:
-            return node
-    return None
-
-def get_function_code(tree, func_name):
-    """Extracts the source code of a function from the AST."""
-    node = find_function_node(tree, func_name)
-    if node:
-        return ast.unparse(node)
-    return None
-
-# --- Other Helper Functions ---
-
-def get_agent_dir(agent_name: str) -> str:
-    """Constructs the full path for an agent directory and validates name."""
-    if "/" in agent_name or "\\" in agent_name or "." in agent_name:
-         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid characters in agent name.")
-    return os.path.join(MANAGED_AGENTS_DIR, agent_name)
-
-def generate_agent_py_code(config: AgentConfig) -> str:
-    """Generates the Python code string for an agent's agent.py file using static imports."""
-    import_statement = ""
-    tools_list_definition = ""
-    agent_tools_arg = ""
-
-    if config.tool_references:
-        # Ensure unique tool names
-        unique_tools = sorted(list(set(config.tool_references)))
-        # Use relative import from agent.py's location (two levels up)
-        import_statement = f"from global_tools import {', '.join(unique_tools)}"
-        tools_list_definition = f"tools_list = [{', '.join(unique_tools)}]"
-        agent_tools_arg = "    tools=tools_list,"
-
-    # Escape triple quotes within the instruction string
-    escaped_instruction = config.instruction.replace('"""', '\\"\\"\\"')
-
-    code = f"""\
-from google.adk.agents import Agent
-{import_statement}
-
-{tools_list_definition}
-
-# Agent definition generated from config
-root_agent = Agent(
-    name="{config.name}",
-    model="{config.model}",
-    description="{config.description or ''}",
-    instruction=\"\"\"{escaped_instruction}\"\"\",
-{agent_tools_arg}
-)
-"""
-    # Ensure final newline
-    if not code.endswith("\n"):
-        code += "\n"
-
-    # Adjust indentation for agent_tools_arg if present
-    if agent_tools_arg:
-        code = code.replace("\n)", ",\n)") # Ensure comma before closing parenthesis if tools are last
-
-    # A final clean-up for potential trailing commas before the closing parenthesis if tools were added
-    code = code.replace(",\n)", "\n)")
-
-    return code
-
-# (Removed write_agent_env_file function)
-
-def write_agent_init_file(agent_dir: str):
-    """
-    Writes the __init__.py file for the agent, including code to add the
-    project root to sys.path to allow absolute imports from global_tools.py.
-    """
-    filepath = os.path.join(agent_dir, "__init__.py")
-    init_content = """\
-import sys
-import os
-
-# Calculate the path to the project root directory (adk_kit)
-# This __init__.py is assumed to be at <project_root>/managed_agents/<agent_name>/__init__.py
-# We need to go up 3 levels from this file's location to get to the project root.
-project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
-# Add the project root to sys.path if it's not already there.
-# Inserting at index 0 ensures it's checked first.
-if project_root not in sys.path:
-    sys.path.insert(0, project_root)
-
-# Now that the project root is potentially in sys.path, the absolute import
-# 'from global_tools import ...' inside agent.py should work.
-from . import agent
-"""
-    try:
-        with open(filepath, "w", encoding="utf-8") as f:
-            f.write(init_content)
-    except IOError as e:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to write __init__.py file: {e}")
-
-def write_agent_py_file(agent_dir: str, config: AgentConfig):
-    """Generates and writes the agent.py file."""
-    filepath = os.path.join(agent_dir, "agent.py")
-    code = generate_agent_py_code(config)
-    try:
-        with open(filepath, "w", encoding="utf-8") as f:
-            f.write(code)
-    except IOError as e:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to write agent.py file: {e}")
-
-def write_agent_config_file(agent_dir: str, config: AgentConfig):
-    """Writes the agent configuration to agent_config.json."""
-    filepath = os.path.join(agent_dir, "agent_config.json")
-    try:
-        with open(filepath, "w", encoding="utf-8") as f:
-            f.write(config.model_dump_json(indent=2))
-    except IOError as e:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to write agent_config.json: {e}")
-
-
-# --- Tool Function Management Endpoints ---
-
-@app.post("/tools", status_code=status.HTTP_201_CREATED, response_model=ToolFunction)
-async def create_tool_function(tool_func: ToolFunction):
-    """
-    Adds a new function definition to the global_tools.py file.
-    """
-    tree = read_global_tools_ast()
-    if find_function_node(tree, tool_func.name):
-        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Function '{tool_func.name}' already exists.")
-
-    try:
-        # Parse the new function code into an AST node
-        new_func_tree = ast.parse(tool_func.code.strip())
-        if not new_func_tree.body or not isinstance(new_func_tree.body[0], (ast.FunctionDef, ast.AsyncFunctionDef)):
-             raise ValueError("Provided code does not contain a valid function definition.")
-        new_func_node = new_func_tree.body[0]
-        if new_func_node.name != tool_func.name:
-             raise ValueError(f"Function name in code ('{new_func_node.name}') does not match provided name ('{tool_func.name}').")
-
-        # Append the new function node to the body of the module AST
-        tree.body.append(new_func_node)
-        write_global_tools_ast(tree)
-        return tool_func
-    except (SyntaxError, ValueError) as e:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid function code provided: {e}")
-    except Exception as e:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to add function: {e}")
-
-
-@app.get("/tools", response_model=List[str])
-async def list_tool_functions():
-    """
-    Lists the names of all functions defined in the global_tools.py file.
-    """
-    tree = read_global_tools_ast()
-    function_names = [
-        node.name for node in ast.walk(tree)
-        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))
-    ]
-    return function_names
-
-@app.get("/tools/{function_name}", response_model=ToolFunction)
-async def get_tool_function(function_name: str):
-    """
-    Retrieves the code definition of a specific function from global_tools.py.
-    """
-    tree = read_global_tools_ast()
-    code = get_function_code(tree, function_name)
-    if code is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Function '{function_name}' not found.")
-    return ToolFunction(name=function_name, code=code)
-
-@app.put("/tools/{function_name}", response_model=ToolFunction)
-async def update_tool_function(function_name: str, tool_func: ToolFunction):
-    """
-    Updates the code definition of an existing function in global_tools.py.
-    The function_name in the path must match the name in the request body.
-    """
-    if function_name != tool_func.name:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Function name in path does not match name in body.")
-
-    tree = read_global_tools_ast()
-    existing_node = find_function_node(tree, function_name)
-    if existing_node is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Function '{function_name}' not found.")
-
-    try:
-        # Parse the new function code
-        new_func_tree = ast.parse(tool_func.code.strip())
-        if not new_func_tree.body or not isinstance(new_func_tree.body[0], (ast.FunctionDef, ast.AsyncFunctionDef)):
-             raise ValueError("Provided code does not contain a valid function definition.")
-        new_func_node = new_func_tree.body[0]
-        if new_func_node.name != function_name:
-             raise ValueError(f"Function name in code ('{new_func_node.name}') does not match target name ('{function_name}').")
-
-        # Find the index of the old node and replace it
-        for i, node in enumerate(tree.body):
-            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name == function_name:
-                # Preserve original line numbers if possible (though unparse might reset)
-                new_func_node.lineno = node.lineno
-                new_func_node.col_offset = node.col_offset
-                tree.body[i] = new_func_node
-                break
-        else:
-             # Should not happen if find_function_node succeeded, but defensive check
-             raise HTTPException(status_code=500, detail="Failed to find node index for replacement.")
-
-        write_global_tools_ast(tree)
-        return tool_func
-    except (SyntaxError, ValueError) as e:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid function code provided: {e}")
-    except Exception as e:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to update function: {e}")
-
-
-@app.delete("/tools/{function_name}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_tool_function(function_name: str):
-    """
-    Deletes a specific function definition from the global_tools.py file.
-    """
-    tree = read_global_tools_ast()
-    new_body = [
-        node for node in tree.body
-        if not (isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name == function_name)
-    ]
-
-    if len(new_body) == len(tree.body): # Check if anything was actually removed
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Function '{function_name}' not found.")
-
-    tree.body = new_body
-    write_global_tools_ast(tree)
-    return None
-
-
-# --- Agent Management Endpoints ---
-# (Keep create_agent, list_agents, get_agent, update_agent, delete_agent from previous version)
-# ... [omitted for brevity - assume they are here] ...
-@app.post("/agents", status_code=status.HTTP_201_CREATED, response_model=AgentRead)
-async def create_agent(agent_config: AgentConfig):
-    """
-    Creates a new agent directory, configuration file (agent_config.json),
-    .env file, __init__.py, and generates the agent.py file based on the config.
-    """
-    agent_dir = get_agent_dir(agent_config.name)
-    if os.path.exists(agent_dir):
-        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Agent '{agent_config.name}' already exists.")
-
-    try:
-        os.makedirs(agent_dir)
-        write_agent_config_file(agent_dir, agent_config)
-        # Removed call to write_agent_env_file
-        write_agent_init_file(agent_dir)
-        write_agent_py_file(agent_dir, agent_config)
-        return AgentRead(**agent_config.model_dump())
-    except Exception as e:
-        if os.path.exists(agent_dir):
-            shutil.rmtree(agent_dir)
-        if isinstance(e, HTTPException):
-            raise e
-        else:
-            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to create agent: {e}")
-
-@app.get("/agents", response_model=List[str])
-async def list_agents():
-    """
-    Lists the names of all agent directories within the managed_agents directory.
-    """
-    try:
-        agents = [d for d in os.listdir(MANAGED_AGENTS_DIR) if os.path.isdir(os.path.join(MANAGED_AGENTS_DIR, d))]
-        return agents
-    except FileNotFoundError:
-        return []
-    except Exception as e:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to list agents: {e}")
-
-@app.get("/agents/{agent_name}", response_model=AgentRead)
-async def get_agent(agent_name: str):
-    """
-    Retrieves the configuration of a specific agent by reading its agent_config.json file.
-    """
-    agent_dir = get_agent_dir(agent_name)
-    config_filepath = os.path.join(agent_dir, "agent_config.json")
-
-    if not os.path.exists(agent_dir) or not os.path.exists(config_filepath):
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Agent '{agent_name}' or its config file not found.")
-
-    try:
-        with open(config_filepath, "r", encoding="utf-8") as f:
-            config_data = AgentConfig.model_validate_json(f.read())
-        if config_data.name != agent_name:
-             print(f"Warning: Agent name in config file ('{config_data.name}') does not match directory name ('{agent_name}'). Returning config anyway.")
-        return AgentRead(**config_data.model_dump())
-    except FileNotFoundError:
-         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Agent config file not found for '{agent_name}'.")
-    except Exception as e:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to read or parse agent config for '{agent_name}': {e}")
-
-@app.put("/agents/{agent_name}", response_model=AgentRead)
-async def update_agent(agent_name: str, agent_config: AgentConfig):
-    """
-    Updates an existing agent's configuration by overwriting its config, .env,
-    and regenerating its agent.py file. The agent_name in the path must match the name in the body.
-    """
-    if agent_name != agent_config.name:
-         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Agent name in path does not match name in body.")
-
-    agent_dir = get_agent_dir(agent_name)
-    if not os.path.exists(agent_dir):
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Agent '{agent_name}' not found.")
-
-    try:
-        write_agent_config_file(agent_dir, agent_config)
-        # Removed call to write_agent_env_file
-        write_agent_init_file(agent_dir)
-        write_agent_py_file(agent_dir, agent_config)
-        return AgentRead(**agent_config.model_dump())
-    except Exception as e:
-        if isinstance(e, HTTPException):
-            raise e
-        else:
-            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to update agent '{agent_name}': {e}")
-
-@app.delete("/agents/{agent_name}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_agent(agent_name: str):
-    """
-    Deletes a specific agent's directory and all its contents.
-    """
-    agent_dir = get_agent_dir(agent_name)
-    if not os.path.exists(agent_dir):
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Agent '{agent_name}' not found.")
-
-    try:
-        shutil.rmtree(agent_dir)
-        return None
-    except Exception as e:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to delete agent '{agent_name}': {e}")
-
-
-# --- Model Listing Endpoint ---
-
-@app.get("/models", response_model=List[str])
-async def list_models():
-    """
-    Returns a list of available models.
-    """
-    return ["gemini-2.0-flash", "gemini-2.5-pro-preview-03-25"]
+import asyncio
+import concurrent.futures
+import functools
+import json
+import os
+import os
+import shutil
+import ast
+import inspect
+import importlib.util
+import re # Added for sanitization
+import string
+from pathlib import Path
+from fastapi import FastAPI, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, ValidationError, field_validator # Added field_validator
+from typing import List, Optional, Dict, Any
+
+try:
+    import orjson  # Optional: faster JSON for agent config files
+except ImportError:
+    orjson = None
+
+# --- Configuration ---
+GLOBAL_TOOLS_FILE = "global_tools.py"
+MANAGED_AGENTS_DIR = "managed_agents"
+# Tool bodies above this size are streamed out of GET /tools/{name}
+_STREAM_THRESHOLD = 64 * 1024
+
+# --- Ensure Base Files/Directories Exist ---
+if not os.path.exists(GLOBAL_TOOLS_FILE):
+    with open(GLOBAL_TOOLS_FILE, "w", encoding="utf-8") as f:
+        f.write("# Global tool functions managed by the API\n")
+        f.write("import datetime\n") # Add common imports maybe?
+        f.write("from zoneinfo import ZoneInfo\n\n")
+os.makedirs(MANAGED_AGENTS_DIR, exist_ok=True)
+# --- Helper Function for Name Sanitization ---
+
+# Precompiled once; sanitize_agent_name runs on every agent request.
+_INVALID_CHARS = re.compile(r'[^a-zA-Z0-9_]')
+
+@functools.lru_cache(maxsize=1024)
+def sanitize_agent_name(name: str) -> str:
+    """
+    Converts a string into a valid Python identifier for agent names.
+
+    Pure function over a low-cardinality input set (Pydantic re-runs the
+    name validator on every AgentConfig construction, including configs
+    re-read from disk), so repeat calls are served from the cache. The
+    validator has already guaranteed a str by the time we get here.
+    """
+    # Fast path: most names are already valid identifiers, so skip the
+    # regex machinery entirely for them.
+    if name.isidentifier():
+        return name
+
+    # Replace common invalid chars (space, hyphen) with underscore
+    name = name.replace(" ", "_").replace("-", "_")
+
+    # Remove any characters that are not letters, digits, or underscores.
+    # search-before-sub avoids allocating a new string when nothing matches.
+    if _INVALID_CHARS.search(name):
+        name = _INVALID_CHARS.sub('', name)
+
+    # Remove leading/trailing underscores that might be left after substitution
+    name = name.strip('_')
+
+    # Prepend underscore if the name starts with a digit
+    if name and name[0].isdigit():
+        name = "_" + name
+
+    # Ensure the name is not empty after sanitization
+    if not name:
+        raise ValueError("Agent name cannot be empty or contain only invalid characters after sanitization.")
+
+    # Final check to ensure it's a valid identifier
+    if not name.isidentifier():
+         # This should ideally not be reached if the logic above is correct, but acts as a safeguard.
+         raise ValueError(f"Sanitized name '{name}' is still not a valid Python identifier.")
+
+    return name
+
+# --- Pydantic Models ---
+
+class ToolFunction(BaseModel):
+    name: str = Field(..., description="Name of the Python function.")
+    code: str = Field(..., description="Full Python code definition of the function, including signature and docstring.")
+    # Optional: Could add fields for parameters, return type, docstring separately if needed for validation
+
+class AgentConfig(BaseModel):
+    name: str = Field(..., description="Unique name for the agent (will be the directory name)")
+    model: str = Field(default="gemini-2.0-flash", description="LLM model ID")
+    description: Optional[str] = Field(default=None, description="Description of the agent's purpose")
+    instruction: str = Field(..., description="System instructions for the agent")
+    # References tools just by function name now
+    tool_references: List[str] = Field(default=[], description="List of tool function names (e.g., 'get_weather', 'get_current_time')")
+    # env_vars field removed
+
+    @field_validator('name', mode='before')
+    @classmethod
+    def validate_and_sanitize_name(cls, v):
+        """Validates and sanitizes the agent name before standard validation."""
+        if not isinstance(v, str):
+             # Raise standard ValueError which Pydantic/FastAPI handles
+             raise ValueError("Agent name must be a string")
+        try:
+            sanitized_name = sanitize_agent_name(v)
+            # Check if sanitization actually changed the name and log/warn if desired
+            # if v != sanitized_name:
+            #     print(f"Sanitized agent name from '{v}' to '{sanitized_name}'")
+            return sanitized_name
+        except ValueError as e:
+            # Re-raise the error from sanitize_agent_name
+            # Pydantic will wrap this in a ValidationError
+            raise ValueError(str(e)) from e
+
+class AgentRead(AgentConfig):
+    pass
+
+# --- FastAPI App ---
+app = FastAPI(title="ADK Agent & Function Manager API")
+
+@app.on_event("startup")
+async def _startup_ast_pool():
+    # Small process pool for cold-path parses of global_tools.py; ast.parse
+    # is GIL-bound, so running it out of process keeps the worker's threads
+    # free. The stat-keyed cache means the pool is only hit on real changes.
+    app.state.ast_pool = concurrent.futures.ProcessPoolExecutor(max_workers=2)
+
+@app.on_event("shutdown")
+async def _shutdown_ast_pool():
+    app.state.ast_pool.shutdown(wait=False)
+
+# --- AST Helper Functions ---
+
+# In-process cache of the parsed global tools module, keyed by the file's
+# stat signature (mtime_ns, size). Nearly every /tools and /agents request
+# re-reads the file, so skipping ast.parse on an unchanged source is the hot
+# path win. Process-local: safe under a single uvicorn worker, where every
+# mutation goes through write_global_tools_ast and refreshes the entry.
+_AST_CACHE: Dict[str, Any] = {}
+
+# Serializes the /tools mutation endpoints. They edit the cached tree in
+# place and then await the file write in a thread; without the lock a second
+# mutation running during that await would splice against line numbers that
+# no longer match the source and corrupt global_tools.py. Mutators hold the
+# lock from load through write, and also pop the cache entry before the
+# first in-place edit, so lock-free readers never see the half-updated tree
+# paired with the old source — during the write window they just re-parse
+# the still-unreplaced file.
+_TOOLS_WRITE_LOCK = asyncio.Lock()
+
+def _atomic_write(filepath: str, data):
+    """
+    Writes data (str or bytes) to filepath atomically: write a sibling .tmp
+    file, fsync, then os.replace it over the target. Readers — and the
+    mtime-keyed AST cache — only ever observe the old or the new content,
+    never a torn partial write that would poison the cache with a
+    SyntaxError.
+    """
+    tmp_path = filepath + ".tmp"
+    try:
+        if isinstance(data, bytes):
+            f = open(tmp_path, "wb")
+        else:
+            f = open(tmp_path, "w", encoding="utf-8")
+        with f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, filepath)
+    except Exception:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def _parse_module(source_code: str):
+    """Module-level parse target so the process pool can pickle it."""
+    return ast.parse(source_code)
+
+async def _load_global_tools_async():
+    """
+    Returns (tree, source) for the global tools file, reusing the cached
+    pair while the file's mtime and size are unchanged. On a miss the
+    GIL-bound ast.parse runs in the process pool so a large module doesn't
+    stall every thread of the worker; falls back to a worker thread when
+    the pool isn't up (startup, tests).
+    """
+    try:
+        file_stat = os.stat(GLOBAL_TOOLS_FILE)
+    except FileNotFoundError:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"{GLOBAL_TOOLS_FILE} not found.")
+    cached = _AST_CACHE.get(GLOBAL_TOOLS_FILE)
+    if cached is not None and cached[0] == file_stat.st_mtime_ns and cached[1] == file_stat.st_size:
+        return cached[2], cached[3]
+    try:
+        source_code = await asyncio.to_thread(Path(GLOBAL_TOOLS_FILE).read_text, encoding="utf-8")
+        pool = getattr(app.state, "ast_pool", None)
+        if pool is not None:
+            tree = await asyncio.get_running_loop().run_in_executor(pool, _parse_module, source_code)
+        else:
+            tree = await asyncio.to_thread(ast.parse, source_code)
+        _AST_CACHE[GLOBAL_TOOLS_FILE] = (file_stat.st_mtime_ns, file_stat.st_size, tree, source_code)
+        return tree, source_code
+    except SyntaxError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Syntax error in {GLOBAL_TOOLS_FILE}: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to read/parse {GLOBAL_TOOLS_FILE}: {e}")
+
+def _write_global_tools_source(new_source: str, tree=None):
+    """
+    Writes source text back to the global tools file and refreshes the
+    cache. Used by the mutation paths that edit the source directly and so
+    preserve the file's original formatting and comments. Callers that
+    have already brought the tree in line with new_source (e.g. by
+    appending a freshly parsed node) can pass it to skip the re-parse.
+    """
+    try:
+        if not new_source.endswith('\n'):
+            new_source += '\n'
+        _atomic_write(GLOBAL_TOOLS_FILE, new_source)
+        if tree is None:
+            tree = ast.parse(new_source)
+        file_stat = os.stat(GLOBAL_TOOLS_FILE)
+        _AST_CACHE[GLOBAL_TOOLS_FILE] = (file_stat.st_mtime_ns, file_stat.st_size, tree, new_source)
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to write {GLOBAL_TOOLS_FILE}: {e}")
+
+def _splice_function_source(source: str, node, new_code: Optional[str]) -> Optional[str]:
+    """
+    Replaces (or removes, when new_code is None) the line span of a
+    top-level function in the source text. Splicing touches only the
+    changed function's lines, unlike ast.unparse which re-prints the whole
+    module. Returns None when the node lacks end position info, signalling
+    the caller to fall back to the full AST round-trip.
+    """
+    end_lineno = getattr(node, "end_lineno", None)
+    if end_lineno is None:
+        return None
+    lines = source.splitlines(keepends=True)
+    # Decorators sit above node.lineno; include them in the replaced span.
+    start_idx = min([node.lineno] + [d.lineno for d in node.decorator_list]) - 1
+    if new_code is None:
+        # Also consume a single leading blank line so deletions don't
+        # accumulate gaps between the remaining functions.
+        if start_idx > 0 and not lines[start_idx - 1].strip():
+            start_idx -= 1
+        replacement = []
+    else:
+        replacement = [new_code.strip() + "\n"]
+    return "".join(lines[:start_idx] + replacement + lines[end_lineno:])
+
+def write_global_tools_ast(tree):
+    """Writes the AST back to the global tools file and refreshes the cache."""
+    try:
+        new_source_code = ast.unparse(tree) # Requires Python 3.9+
+        # Add a newline at the end if missing
+        if not new_source_code.endswith('\n'):
+            new_source_code += '\n'
+        _atomic_write(GLOBAL_TOOLS_FILE, new_source_code)
+        # Re-parse before caching: the unparsed tree's line numbers no
+        # longer match the written text, which would corrupt later splices.
+        file_stat = os.stat(GLOBAL_TOOLS_FILE)
+        _AST_CACHE[GLOBAL_TOOLS_FILE] = (file_stat.st_mtime_ns, file_stat.st_size, ast.parse(new_source_code), new_source_code)
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to write {GLOBAL_TOOLS_FILE}: {e}")
+
+def _index_tree(tree):
+    """
+    Builds (and attaches to the tree) a name -> (body index, node) map of
+    the module's top-level function definitions. Tool functions only ever
+    live at the top level, so this replaces O(n) ast.walk traversals with
+    a one-time scan of tree.body and O(1) lookups afterwards.
+    """
+    index = getattr(tree, "_func_index", None)
+    if index is None:
+        index = {
+            node.name: (i, node)
+            for i, node in enumerate(tree.body)
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))
+        }
+        tree._func_index = index
+        # Name set for bare existence checks; kept alongside the index so
+        # both rebuild together on invalidation.
+        tree._func_names = frozenset(index)
+    return index
+
+def _function_names(tree):
+    """Returns the frozenset of top-level function names for membership tests."""
+    _index_tree(tree)
+    return tree._func_names
+
+def _invalidate_index(tree):
+    """Drops the attached function index after tree.body has been mutated."""
+    if hasattr(tree, "_func_index"):
+        del tree._func_index
+        del tree._func_names
+
+def find_function_node(tree, func_name):
+    """Finds a top-level function definition node by name via the tree index."""
+    entry = _index_tree(tree).get(func_name)
+    return entry[1] if entry is not None else None
+
+def get_function_code(tree, func_name, source=None):
+    """
+    Extracts the source code of a function, slicing the original text when
+    position info is available (preserving formatting and comments) and
+    falling back to ast.unparse otherwise.
+    """
+    node = find_function_node(tree, func_name)
+    if node is None:
+        return None
+    end_lineno = getattr(node, "end_lineno", None)
+    if source is not None and end_lineno is not None:
+        lines = source.splitlines(keepends=True)
+        start_idx = min([node.lineno] + [d.lineno for d in node.decorator_list]) - 1
+        return "".join(lines[start_idx:end_lineno]).rstrip("\n")
+    return ast.unparse(node)
+
+# --- Other Helper Functions ---
+
+# Path-traversal characters rejected in agent names; checked on every
+# agent endpoint, so test membership in one pass instead of three scans.
+_BAD_AGENT_NAME_CHARS = frozenset('/\\.')
+
+def get_agent_dir(agent_name: str) -> str:
+    """Constructs the full path for an agent directory and validates name."""
+    if any(c in _BAD_AGENT_NAME_CHARS for c in agent_name):
+         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid characters in agent name.")
+    return os.path.join(MANAGED_AGENTS_DIR, agent_name)
+
+# Prebuilt once at import; substitution is a single C-level pass with no
+# per-call branching over the template text itself.
+_AGENT_TPL = string.Template('''\
+from google.adk.agents import Agent
+$imports
+# Agent definition generated from config
+root_agent = Agent(
+    name="$name",
+    model="$model",
+    description="$desc",
+    instruction="""$instr""",
+$tools_line)
+''')
+
+@functools.lru_cache(maxsize=256)
+def _generate_agent_py_code(name: str, model: str, description: Optional[str], instruction: str, tool_references: tuple) -> str:
+    """Cached worker for generate_agent_py_code, keyed on the config fields."""
+    # Escape triple quotes within the instruction string
+    escaped_instruction = instruction.replace('"""', '\\"\\"\\"')
+
+    if tool_references:
+        # tool_references arrives unique and sorted from the caller.
+        # Use relative import from agent.py's location (two levels up)
+        joined_tools = ', '.join(tool_references)
+        import_statement = f"from global_tools import {joined_tools}\n"
+        # The tools line carries its own trailing comma, so the template
+        # needs no post-hoc .replace() fix-up passes over the full string.
+        tools_line = f"    tools=[{joined_tools}],\n"
+    else:
+        import_statement = ""
+        tools_line = ""
+
+    return _AGENT_TPL.substitute(
+        imports=import_statement,
+        name=name,
+        model=model,
+        desc=description or "",
+        instr=escaped_instruction,
+        tools_line=tools_line,
+    )
+
+def generate_agent_py_code(config: AgentConfig) -> str:
+    """Generates the Python code string for an agent's agent.py file using static imports."""
+    # Freeze the fields into a hashable key so identical configs (repeated
+    # saves, cloned agents) reuse the generated text instead of re-rendering.
+    return _generate_agent_py_code(
+        config.name,
+        config.model,
+        config.description,
+        config.instruction,
+        tuple(sorted(set(config.tool_references))),
+    )
+
+# (Removed write_agent_env_file function)
+
+# The agent __init__.py is identical for every agent; precompute it once
+# as bytes instead of rebuilding the string on each write.
+_INIT_PY_BYTES = b"""\
+import sys
+import os
+
+# Calculate the path to the project root directory (adk_kit)
+# This __init__.py is assumed to be at <project_root>/managed_agents/<agent_name>/__init__.py
+# We need to go up 3 levels from this file's location to get to the project root.
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Add the project root to sys.path if it's not already there.
+# Inserting at index 0 ensures it's checked first.
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+# Now that the project root is potentially in sys.path, the absolute import
+# 'from global_tools import ...' inside agent.py should work.
+from . import agent
+"""
+
+def write_agent_init_file(agent_dir: str):
+    """
+    Writes the __init__.py file for the agent, including code to add the
+    project root to sys.path to allow absolute imports from global_tools.py.
+    """
+    filepath = os.path.join(agent_dir, "__init__.py")
+    try:
+        _atomic_write(filepath, _INIT_PY_BYTES)
+    except IOError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to write __init__.py file: {e}")
+
+def write_agent_py_file(agent_dir: str, config: AgentConfig):
+    """Generates and writes the agent.py file."""
+    filepath = os.path.join(agent_dir, "agent.py")
+    code = generate_agent_py_code(config)
+    try:
+        _atomic_write(filepath, code)
+    except IOError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to write agent.py file: {e}")
+
+def _dump_agent_config(config: AgentConfig) -> bytes:
+    """Serializes an AgentConfig to the agent_config.json byte format."""
+    # orjson serializes straight to indented UTF-8 bytes, skipping the
+    # str encode step of model_dump_json.
+    if orjson is not None:
+        return orjson.dumps(config.model_dump(), option=orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE)
+    return config.model_dump_json(indent=2).encode("utf-8")
+
+def write_agent_config_file(agent_dir: str, config: AgentConfig):
+    """Writes the agent configuration to agent_config.json."""
+    filepath = os.path.join(agent_dir, "agent_config.json")
+    try:
+        _atomic_write(filepath, _dump_agent_config(config))
+    except IOError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to write agent_config.json: {e}")
+
+
+# --- Tool Function Management Endpoints ---
+
+async def _tool_function_from_request(request: Request, name_hint: Optional[str] = None) -> ToolFunction:
+    """
+    Builds a ToolFunction from the request body. A raw text/x-python (or
+    text/plain) body with the name in ?name= skips JSON string escaping of
+    the source on both sides — worthwhile for large tool bodies. JSON
+    payloads keep working unchanged.
+    """
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith(("text/x-python", "text/plain")):
+        name = name_hint or request.query_params.get("name")
+        if not name:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Missing 'name' query parameter for raw tool upload.")
+        code = (await request.body()).decode("utf-8")
+        payload = {"name": name, "code": code}
+    else:
+        try:
+            payload = await request.json()
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Request body is not valid JSON.")
+    try:
+        return ToolFunction(**payload)
+    except (ValidationError, TypeError) as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f"Invalid tool payload: {e}")
+
+@app.post("/tools", status_code=status.HTTP_201_CREATED, response_model=ToolFunction)
+async def create_tool_function(request: Request):
+    """
+    Adds a new function definition to the global_tools.py file. Accepts a
+    JSON ToolFunction or raw Python source with ?name=.
+    """
+    tool_func = await _tool_function_from_request(request)
+    async with _TOOLS_WRITE_LOCK:
+        tree, source = await _load_global_tools_async()
+        if tool_func.name in _function_names(tree):
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Function '{tool_func.name}' already exists.")
+
+        try:
+            new_code = tool_func.code.strip()
+            # PyCF_ONLY_AST validates the syntax without generating bytecode
+            new_func_tree = compile(new_code, "<tool>", "exec", flags=ast.PyCF_ONLY_AST)
+            if not new_func_tree.body or not isinstance(new_func_tree.body[0], (ast.FunctionDef, ast.AsyncFunctionDef)):
+                 raise ValueError("Provided code does not contain a valid function definition.")
+            new_func_node = new_func_tree.body[0]
+            if new_func_node.name != tool_func.name:
+                 raise ValueError(f"Function name in code ('{new_func_node.name}') does not match provided name ('{tool_func.name}').")
+
+            # Append the original text verbatim — no whole-module unparse, and
+            # the author's formatting and comments survive on disk.
+            new_source = source if source.endswith("\n") else source + "\n"
+            new_source += "\n"
+            # Shift the parsed node to its real position in the file so the
+            # line-splice edit paths keep working against the cached tree.
+            ast.increment_lineno(new_func_node, new_source.count("\n"))
+            new_source += new_code + "\n"
+            # Detach the cache entry before touching the shared tree: until
+            # the write lands, readers re-parse the old file instead of
+            # pairing the mutated tree with the old source.
+            _AST_CACHE.pop(GLOBAL_TOOLS_FILE, None)
+            tree.body.append(new_func_node)
+            _invalidate_index(tree)
+            await asyncio.to_thread(_write_global_tools_source, new_source, tree)
+            return tool_func
+        except (SyntaxError, ValueError) as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid function code provided: {e}")
+        except Exception as e:
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to add function: {e}")
+
+
+# Matches column-0 (async) def statements; the ^ anchor in MULTILINE mode
+# keeps defs nested inside other functions out of the listing.
+_FUNC_DEF_RE = re.compile(rb'^(?:async\s+)?def\s+([A-Za-z_]\w*)\s*\(', re.MULTILINE)
+
+@app.get("/tools", response_model=List[str])
+async def list_tool_functions():
+    """
+    Lists the names of all functions defined in the global_tools.py file.
+    """
+    def _scan():
+        # Only names are needed, so a regex pass over the raw bytes beats
+        # building a full AST for the module.
+        with open(GLOBAL_TOOLS_FILE, "rb") as f:
+            data = f.read()
+        return [m.group(1).decode() for m in _FUNC_DEF_RE.finditer(data)]
+
+    try:
+        return await asyncio.to_thread(_scan)
+    except FileNotFoundError:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"{GLOBAL_TOOLS_FILE} not found.")
+
+@app.get("/tools/{function_name}", response_model=ToolFunction)
+async def get_tool_function(function_name: str):
+    """
+    Retrieves the code definition of a specific function from global_tools.py.
+    """
+    tree, source = await _load_global_tools_async()
+    code = get_function_code(tree, function_name, source)
+    if code is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Function '{function_name}' not found.")
+    if len(code) > _STREAM_THRESHOLD:
+        # Stream very large bodies in chunks instead of building one big
+        # response string on the event loop. Escaping is per-character, so
+        # chunk-wise json.dumps framing is safe.
+        def _chunks():
+            yield b'{"name":' + json.dumps(function_name).encode() + b',"code":"'
+            for i in range(0, len(code), _STREAM_THRESHOLD):
+                yield json.dumps(code[i:i + _STREAM_THRESHOLD])[1:-1].encode()
+            yield b'"}'
+        return StreamingResponse(_chunks(), media_type="application/json")
+    return ToolFunction(name=function_name, code=code)
+
+@app.put("/tools/{function_name}", response_model=ToolFunction)
+async def update_tool_function(function_name: str, request: Request):
+    """
+    Updates the code definition of an existing function in global_tools.py.
+    Accepts a JSON ToolFunction or raw Python source; for JSON the name in
+    the body must match the function_name in the path.
+    """
+    tool_func = await _tool_function_from_request(request, name_hint=function_name)
+    if function_name != tool_func.name:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Function name in path does not match name in body.")
+
+    async with _TOOLS_WRITE_LOCK:
+        tree, source = await _load_global_tools_async()
+        entry = _index_tree(tree).get(function_name)
+        if entry is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Function '{function_name}' not found.")
+
+        try:
+            # Parse the new function code
+            new_func_tree = ast.parse(tool_func.code.strip())
+            if not new_func_tree.body or not isinstance(new_func_tree.body[0], (ast.FunctionDef, ast.AsyncFunctionDef)):
+                 raise ValueError("Provided code does not contain a valid function definition.")
+            new_func_node = new_func_tree.body[0]
+            if new_func_node.name != function_name:
+                 raise ValueError(f"Function name in code ('{new_func_node.name}') does not match target name ('{function_name}').")
+
+            node_index, old_node = entry
+            # Splice the new code over the old function's line span; this keeps
+            # the rest of the file byte-identical instead of re-printing the
+            # whole module via ast.unparse.
+            new_source = _splice_function_source(source, old_node, tool_func.code)
+            # Detach the cache entry before touching the shared tree: until
+            # the write lands, readers re-parse the old file instead of
+            # pairing the mutated tree with the old source.
+            _AST_CACHE.pop(GLOBAL_TOOLS_FILE, None)
+            if new_source is not None:
+                # Bring the cached tree in line with the spliced text so the
+                # write can skip the whole-module re-parse: position the fresh
+                # node at the old one's start and shift everything below by
+                # the change in line count.
+                start = min([old_node.lineno] + [d.lineno for d in old_node.decorator_list])
+                ast.increment_lineno(new_func_node, start - 1)
+                delta = new_source.count("\n") - source.count("\n")
+                if delta:
+                    for later_node in tree.body[node_index + 1:]:
+                        ast.increment_lineno(later_node, delta)
+                tree.body[node_index] = new_func_node
+                _invalidate_index(tree)
+                await asyncio.to_thread(_write_global_tools_source, new_source, tree)
+            else:
+                tree.body[node_index] = new_func_node
+                _invalidate_index(tree)
+                await asyncio.to_thread(write_global_tools_ast, tree)
+            return tool_func
+        except (SyntaxError, ValueError) as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid function code provided: {e}")
+        except Exception as e:
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to update function: {e}")
+
+
+@app.delete("/tools/{function_name}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_tool_function(function_name: str):
+    """
+    Deletes a specific function definition from the global_tools.py file.
+    """
+    async with _TOOLS_WRITE_LOCK:
+        tree, source = await _load_global_tools_async()
+        entry = _index_tree(tree).get(function_name)
+        if entry is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Function '{function_name}' not found.")
+
+        new_source = _splice_function_source(source, entry[1], None)
+        # Detach the cache entry before touching the shared tree (see the
+        # note on _TOOLS_WRITE_LOCK).
+        _AST_CACHE.pop(GLOBAL_TOOLS_FILE, None)
+        if new_source is not None:
+            # Drop the node from the cached tree and shift the nodes below it
+            # up by the removed line count; the write then skips the
+            # whole-module re-parse.
+            node_index = entry[0]
+            del tree.body[node_index]
+            delta = new_source.count("\n") - source.count("\n")
+            if delta:
+                for later_node in tree.body[node_index:]:
+                    ast.increment_lineno(later_node, delta)
+            _invalidate_index(tree)
+            await asyncio.to_thread(_write_global_tools_source, new_source, tree)
+        else:
+            del tree.body[entry[0]]
+            _invalidate_index(tree)
+            await asyncio.to_thread(write_global_tools_ast, tree)
+        return None
+
+
+# --- Agent Management Endpoints ---
+# (Keep create_agent, list_agents, get_agent, update_agent, delete_agent from previous version)
+# ... [omitted for brevity - assume they are here] ...
+@app.post("/agents", status_code=status.HTTP_201_CREATED, response_model=AgentRead)
+async def create_agent(agent_config: AgentConfig):
+    """
+    Creates a new agent directory, configuration file (agent_config.json),
+    .env file, __init__.py, and generates the agent.py file based on the config.
+    """
+    agent_dir = get_agent_dir(agent_config.name)
+    if os.path.exists(agent_dir):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Agent '{agent_config.name}' already exists.")
+
+    try:
+        await asyncio.to_thread(os.makedirs, agent_dir)
+        # The three files are independent; write them concurrently off the
+        # event loop so the worker keeps serving other requests.
+        await asyncio.gather(
+            asyncio.to_thread(write_agent_config_file, agent_dir, agent_config),
+            # Removed call to write_agent_env_file
+            asyncio.to_thread(write_agent_init_file, agent_dir),
+            asyncio.to_thread(write_agent_py_file, agent_dir, agent_config),
+        )
+        # model_construct skips validators — the config is already
+        # validated — so the AgentRead response costs an attribute copy.
+        return AgentRead.model_construct(**agent_config.__dict__)
+    except Exception as e:
+        if os.path.exists(agent_dir):
+            await asyncio.to_thread(shutil.rmtree, agent_dir)
+        if isinstance(e, HTTPException):
+            raise e
+        else:
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to create agent: {e}")
+
+@app.get("/agents", response_model=List[str])
+async def list_agents():
+    """
+    Lists the names of all agent directories within the managed_agents directory.
+    """
+    def _scan():
+        # DirEntry.is_dir() uses the d_type already returned by getdents64,
+        # so no per-entry stat() is needed (unlike listdir + isdir).
+        with os.scandir(MANAGED_AGENTS_DIR) as it:
+            return [e.name for e in it if e.is_dir()]
+
+    try:
+        return await asyncio.to_thread(_scan)
+    except FileNotFoundError:
+        return []
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to list agents: {e}")
+
+@app.get("/agents/{agent_name}", response_model=AgentRead)
+async def get_agent(agent_name: str):
+    """
+    Retrieves the configuration of a specific agent by reading its agent_config.json file.
+    """
+    agent_dir = get_agent_dir(agent_name)
+    config_filepath = os.path.join(agent_dir, "agent_config.json")
+
+    if not os.path.exists(agent_dir) or not os.path.exists(config_filepath):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Agent '{agent_name}' or its config file not found.")
+
+    try:
+        # model_validate_json accepts bytes, so read binary and skip the
+        # UTF-8 decode round-trip.
+        raw = await asyncio.to_thread(Path(config_filepath).read_bytes)
+        config_data = AgentConfig.model_validate_json(raw)
+        if config_data.name != agent_name:
+             print(f"Warning: Agent name in config file ('{config_data.name}') does not match directory name ('{agent_name}'). Returning config anyway.")
+        return AgentRead.model_construct(**config_data.__dict__)
+    except FileNotFoundError:
+         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Agent config file not found for '{agent_name}'.")
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to read or parse agent config for '{agent_name}': {e}")
+
+@app.put("/agents/{agent_name}", response_model=AgentRead)
+async def update_agent(agent_name: str, agent_config: AgentConfig):
+    """
+    Updates an existing agent's configuration by overwriting its config, .env,
+    and regenerating its agent.py file. The agent_name in the path must match the name in the body.
+    """
+    if agent_name != agent_config.name:
+         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Agent name in path does not match name in body.")
+
+    agent_dir = get_agent_dir(agent_name)
+    if not os.path.exists(agent_dir):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Agent '{agent_name}' not found.")
+
+    try:
+        # Clients commonly re-PUT an unchanged config to "save". The agent
+        # files are a deterministic function of the config, so if the new
+        # config serializes to the bytes already on disk there is nothing
+        # to regenerate or write.
+        config_filepath = os.path.join(agent_dir, "agent_config.json")
+        new_bytes = _dump_agent_config(agent_config)
+        try:
+            old_bytes = await asyncio.to_thread(Path(config_filepath).read_bytes)
+        except OSError:
+            old_bytes = None
+        if old_bytes == new_bytes:
+            return AgentRead.model_construct(**agent_config.__dict__)
+
+        writes = [
+            asyncio.to_thread(write_agent_config_file, agent_dir, agent_config),
+            # Removed call to write_agent_env_file
+            asyncio.to_thread(write_agent_py_file, agent_dir, agent_config),
+        ]
+        # __init__.py content is invariant across agents; only rewrite it
+        # if it has gone missing.
+        if not os.path.exists(os.path.join(agent_dir, "__init__.py")):
+            writes.append(asyncio.to_thread(write_agent_init_file, agent_dir))
+        await asyncio.gather(*writes)
+        return AgentRead.model_construct(**agent_config.__dict__)
+    except Exception as e:
+        if isinstance(e, HTTPException):
+            raise e
+        else:
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to update agent '{agent_name}': {e}")
+
+@app.delete("/agents/{agent_name}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_agent(agent_name: str):
+    """
+    Deletes a specific agent's directory and all its contents.
+    """
+    agent_dir = get_agent_dir(agent_name)
+    if not os.path.exists(agent_dir):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Agent '{agent_name}' not found.")
+
+    def _remove_agent_dir():
+        # Agent dirs normally contain exactly these three files, so direct
+        # unlinks plus rmdir beat shutil.rmtree's recursive stat-and-walk.
+        for fname in ("agent.py", "__init__.py", "agent_config.json"):
+            try:
+                os.unlink(os.path.join(agent_dir, fname))
+            except FileNotFoundError:
+                pass
+        try:
+            os.rmdir(agent_dir)
+        except OSError:
+            # Extra files appeared (e.g. __pycache__); take the slow path.
+            shutil.rmtree(agent_dir)
+
+    try:
+        await asyncio.to_thread(_remove_agent_dir)
+        return None
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to delete agent '{agent_name}': {e}")
+
+
+# --- Model Listing Endpoint ---
+
+@app.get("/models", response_model=List[str])
+async def list_models():
+    """
+    Returns a list of available models.
+    """
+    return ["gemini-2.0-flash", "gemini-2.5-pro-preview-03-25"]
@@ -1,216 +1,475 @@
 
+import asyncio
+import concurrent.futures
 import streamlit as st
 import requests
 import json
-from streamlit_ace import st_ace # Import the Ace editor component
+from urllib.parse import quote
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+# streamlit_ace is imported lazily in the Tool Management branch below —
+# the Agent Management page never needs the Ace editor bundle.
+
+try:
+    import httpx  # Optional: async fan-out for multi-fetch pages
+except ImportError:
+    httpx = None
+
+try:
+    import orjson  # Optional: faster JSON decode/encode for API payloads
+except ImportError:
+    orjson = None
 
 # --- Configuration ---
 API_BASE_URL = "http://localhost:8001" # The address of your ADK Agent/Tool Manager API
+# Endpoint roots built once; per-call URLs are plain concatenations
+_AGENTS_URL = API_BASE_URL + "/agents"
+_TOOLS_URL = API_BASE_URL + "/tools"
+
+# Default (connect, read) timeout for all API calls (seconds)
+REQUEST_TIMEOUT = (2, 10)
+
+# Shared session so the many back-to-back calls a single rerun makes reuse
+# one keep-alive connection instead of opening a fresh TCP socket each time.
+# Transient gateway errors retry with short backoff below the UI instead of
+# stalling the script runner until the user clicks again.
+_session = requests.Session()
+_retry = Retry(
+    total=3,
+    backoff_factor=0.2,
+    status_forcelist=[502, 503, 504],
+    allowed_methods=["GET", "PUT", "POST", "DELETE"],
+)
+_session.mount("http://", HTTPAdapter(max_retries=_retry, pool_connections=4, pool_maxsize=16))
+_session.headers.update({"Accept": "application/json"})
+
+# Connection-level errors to surface as st.error rather than tracebacks
+if httpx is not None:
+    _FETCH_ERRORS = (requests.exceptions.RequestException, httpx.HTTPError)
+else:
+    _FETCH_ERRORS = (requests.exceptions.RequestException,)
 
 # --- API Client Functions ---
+def _decode_json(response):
+    """Decodes a response body with orjson when available (C-speed parse)."""
+    if orjson is not None:
+        return orjson.loads(response.content)
+    return response.json()
+
+def _json_kwargs(payload):
+    """Request kwargs for a JSON body, serialized with orjson when available."""
+    if orjson is not None:
+        return {"data": orjson.dumps(payload), "headers": {"Content-Type": "application/json"}}
+    return {"json": payload}
+
 def handle_api_response(response):
     """Helper function to handle API responses and errors."""
     if response.status_code == 200:
         try:
-            return response.json()
-        except json.JSONDecodeError:
+            return _decode_json(response)
+        except ValueError:
+            # Covers both json.JSONDecodeError and orjson.JSONDecodeError
             st.error(f"Error decoding JSON response from API. Status code: {response.status_code}")
             return None
     elif response.status_code == 404:
         # Specifically handle 404 for "not found" cases without showing a big error
         return None
     else:
+        # Parse the body once from bytes; only decode the raw text when the
+        # payload isn't the expected {"detail": ...} shape. The old
+        # response.text fallback re-decoded the same bytes a second time.
         try:
-            detail = response.json().get("detail", response.text)
-        except json.JSONDecodeError:
-            detail = response.text
+            parsed = _decode_json(response)
+            detail = parsed.get("detail") if isinstance(parsed, dict) else None
+        except ValueError:
+            detail = None
+        if detail is None:
+            detail = response.content.decode("utf-8", "replace")
         st.error(f"API Error ({response.status_code}): {detail}")
         return None
 
+def _get_json(url):
+    """
+    GET with ETag revalidation: sends If-None-Match when a previous 200
+    for this URL carried an ETag, and serves the remembered body on 304 so
+    unchanged payloads are neither re-downloaded nor re-decoded.
+    """
+    headers = None
+    etag = st.session_state.get(f"etag:{url}")
+    if etag:
+        headers = {"If-None-Match": etag}
+    response = _session.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+    if response.status_code == 304:
+        return st.session_state.get(f"body:{url}")
+    data = handle_api_response(response)
+    if response.status_code == 200:
+        new_etag = response.headers.get("ETag")
+        if new_etag:
+            st.session_state[f"etag:{url}"] = new_etag
+            st.session_state[f"body:{url}"] = data
+    return data
+
+def _coerce_name_list(data, label):
+    """
+    Normalizes a name-list payload — strings, or legacy dicts carrying a
+    "name" key — into a tuple in one pass. Returns () for None (an error
+    was already shown, or it was a 404) and reports unexpected shapes.
+    """
+    if data is None:
+        return ()
+    if not isinstance(data, list):
+        st.error(f"API returned unexpected data type for {label}: {type(data)}")
+        return ()
+    return tuple(
+        item if isinstance(item, str) else item.get("name")
+        for item in data
+        if isinstance(item, (str, dict))
+    )
+
+@st.cache_data(ttl=30, show_spinner=False)
 def get_agents():
-    """Fetches the list of agent names from the API."""
+    """Fetches the list of agent names from the API (cached across reruns)."""
     try:
-        response = requests.get(f"{API_BASE_URL}/agents")
-        data = handle_api_response(response)
-        # Ensure data is a list before processing
-        if isinstance(data, list):
-            # Check if the first element is a string (assuming non-empty list)
-            # Or handle empty list case
-            if not data or isinstance(data[0], str):
-                # API returns a list of strings directly
-                return data
-            elif isinstance(data[0], dict):
-                 # API returns a list of dicts (handle previous assumption just in case)
-                 return [agent.get("name") for agent in data if isinstance(agent, dict)]
-            else:
-                 st.error(f"API returned list with unexpected element type for agents: {type(data[0])}")
-                 return []
-        elif data is not None:
-             st.error(f"API returned unexpected data type for agents: {type(data)}")
-             return []
-        else:
-             # handle_api_response already showed an error or it was a 404
-             return []
+        return _coerce_name_list(_get_json(_AGENTS_URL), "agents")
     except requests.exceptions.RequestException as e:
         st.error(f"Connection Error fetching agents: {e}")
-        return []
-
-def get_agent_details(agent_name):
-    """Fetches the configuration details for a specific agent."""
-    try:
-        response = requests.get(f"{API_BASE_URL}/agents/{agent_name}")
-        return handle_api_response(response)
-    except requests.exceptions.RequestException as e:
-        st.error(f"Connection Error fetching agent details for {agent_name}: {e}")
-        return None
+        return ()
 
+@st.cache_data(ttl=30, show_spinner=False)
 def get_tools():
-    """Fetches the list of tool names from the API."""
+    """Fetches the list of tool names from the API (cached across reruns)."""
     try:
-        response = requests.get(f"{API_BASE_URL}/tools")
-        data = handle_api_response(response)
-        # Ensure data is a list before processing
-        if isinstance(data, list):
-             # Check if the first element is a string (assuming non-empty list)
-             # Or handle empty list case
-            if not data or isinstance(data[0], str):
-                 # API returns a list of strings directly
-                 return data
-            elif isinstance(data[0], dict):
-                 # API returns a list of dicts (handle previous assumption just in case)
-                 return [tool.get("name") for tool in data if isinstance(tool, dict)]
-            else:
-                 st.error(f"API returned list with unexpected element type for tools: {type(data[0])}")
-                 return []
-        elif data is not None:
-            st.error(f"API returned unexpected data type for tools: {type(data)}")
-            return []
-        else:
-            # handle_api_response already showed an error or it was a 404
-            return []
+        return _coerce_name_list(_get_json(_TOOLS_URL), "tools")
     except requests.exceptions.RequestException as e:
         st.error(f"Connection Error fetching tools: {e}")
-        return []
+        return ()
 
+@st.cache_data(ttl=5, show_spinner=False)
 def get_tool_details(tool_name):
-    """Fetches the details (name, code) for a specific tool."""
+    """Fetches the details (name, code) for a specific tool. Short TTL:
+    the code is edited in place, so staleness must stay within seconds."""
     try:
         # Note: API endpoint uses 'function_name' path parameter
-        response = requests.get(f"{API_BASE_URL}/tools/{tool_name}")
-        return handle_api_response(response)
+        return _get_json(_TOOLS_URL + "/" + quote(tool_name))
     except requests.exceptions.RequestException as e:
         st.error(f"Connection Error fetching tool details for {tool_name}: {e}")
         return None
 
-def create_agent(agent_config):
-    """Creates a new agent via the API. Returns True on success."""
+def _parallel_get(url_map):
+    """
+    Issues one _session.get per {key: url} entry concurrently and returns
+    {key: response}. Independent fetches in a single rerun overlap on the
+    wire instead of paying one round-trip after another.
+    """
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as pool:
+        futures = {key: pool.submit(_session.get, url, timeout=REQUEST_TIMEOUT) for key, url in url_map.items()}
+        return {key: future.result() for key, future in futures.items()}
+
+def fetch_all(url_map):
+    """
+    Fetches {key: url} concurrently and returns {key: response}. Uses a
+    single httpx event loop when available (one connection, multiplexed
+    requests); otherwise falls back to the thread-pool fan-out.
+    """
+    if httpx is None:
+        return _parallel_get(url_map)
+
+    async def _gather():
+        headers = {"Accept": "application/json"}
+        # httpx takes its own Timeout type rather than requests' tuple
+        async with httpx.AsyncClient(timeout=httpx.Timeout(10.0, connect=2.0), headers=headers) as client:
+            keys = list(url_map)
+            responses = await asyncio.gather(*(client.get(url_map[key]) for key in keys))
+            return dict(zip(keys, responses))
+
+    return asyncio.run(_gather())
+
+@st.cache_data(ttl=5, show_spinner=False)
+def get_agent_page_data(agent_name):
+    """Fetches an agent's details and the tool list in one parallel round."""
+    try:
+        results = fetch_all({
+            "details": _AGENTS_URL + "/" + quote(agent_name),
+            "tools": _TOOLS_URL,
+        })
+    except _FETCH_ERRORS as e:
+        st.error(f"Connection Error fetching agent page data for {agent_name}: {e}")
+        return None, ()
+    details = handle_api_response(results["details"])
+    tools = handle_api_response(results["tools"])
+    return details, _coerce_name_list(tools, "tools")
+
+def _send_tool_code(method, url, name, code):
+    """
+    Sends tool source as a raw text/x-python body with the name in the
+    query string, so multi-KB Python code isn't JSON-escaped and decoded
+    on both ends. Falls back to the JSON payload for servers that don't
+    accept the raw content type.
+    """
+    response = _session.request(
+        method, url,
+        params={"name": name},
+        data=code.encode("utf-8"),
+        headers={"Content-Type": "text/x-python"},
+        timeout=REQUEST_TIMEOUT,
+    )
+    if response.status_code in (415, 422):
+        response = _session.request(method, url, timeout=REQUEST_TIMEOUT, **_json_kwargs({"name": name, "code": code}))
+    return response
+
+def _check(response, expect):
+    """Returns True when the status is expected; otherwise routes the
+    response through handle_api_response so the error is shown once."""
+    if response.status_code in expect:
+        return True
+    handle_api_response(response) # Display error via helper
+    return False
+
+def _api(method, path, *, expect=(200,), **kwargs):
+    """
+    One scaffold for every mutating call: shared session, common timeout,
+    expected-status check and error display. The CRUD helpers below are
+    thin named wrappers, so retry/encoding/session policy lives here.
+    """
     try:
-        response = requests.post(f"{API_BASE_URL}/agents", json=agent_config)
-        if response.status_code == 201: # Created
-            # st.success(f"Agent '{agent_config.get('name')}' created successfully!") # Moved
-            return True
-        else:
-            handle_api_response(response) # Display error via helper
-            return False
+        response = _session.request(method, API_BASE_URL + path, timeout=REQUEST_TIMEOUT, **kwargs)
+        return _check(response, expect)
     except requests.exceptions.RequestException as e:
-        st.error(f"Connection Error creating agent: {e}")
+        st.error(f"Connection Error during {method} {path}: {e}")
         return False
 
+def create_agent(agent_config):
+    """Creates a new agent via the API. Returns True on success."""
+    return _api("POST", "/agents", expect=(201,), **_json_kwargs(agent_config))
+
 def create_tool(tool_name, tool_code):
     """Creates a new tool via the API. Returns True on success."""
     try:
-        payload = {"name": tool_name, "code": tool_code}
-        response = requests.post(f"{API_BASE_URL}/tools", json=payload)
-        if response.status_code == 201: # Created
-            # st.success(f"Tool '{tool_name}' created successfully!") # Moved
-            return True
-        else:
-            handle_api_response(response) # Display error via helper
-            return False
+        return _check(_send_tool_code("POST", _TOOLS_URL, tool_name, tool_code), (201,))
     except requests.exceptions.RequestException as e:
         st.error(f"Connection Error creating tool: {e}")
         return False
 
 def update_agent(agent_name, agent_config):
-    """Updates an existing agent via the API. Returns True on success."""
-    try:
-        # Ensure the name in the URL matches the payload if it's part of the config
-        # Or remove it from the payload if the API doesn't expect it
-        payload = agent_config.copy()
-        if 'name' in payload and payload['name'] != agent_name:
-             st.warning("Agent name in payload differs from URL name. Using URL name for endpoint.")
-             # Decide API behavior: some might allow name change via PUT, others not.
-             # Assuming name change isn't primary via PUT payload here.
-             # If name change is allowed, the API endpoint might need adjustment or payload structure.
-             # Let's assume the API uses the name in the URL to identify the agent and updates based on payload.
-             # If the API expects the name *in* the payload for validation, keep it.
-             # If the API *only* uses the URL name, you might remove payload['name'].
-             # For now, we keep it but are aware of potential API design implications.
-
-        response = requests.put(f"{API_BASE_URL}/agents/{agent_name}", json=payload)
-        if response.status_code == 200:
-            # st.success(f"Agent '{agent_name}' updated successfully!") # Moved
-            return True
-        else:
-            handle_api_response(response) # Display error via helper
-            return False
-    except requests.exceptions.RequestException as e:
-        st.error(f"Connection Error updating agent {agent_name}: {e}")
-        return False
+    """Updates an existing agent via the API. Returns True on success.
+
+    Invariant: the URL name is authoritative. The update form always builds
+    the payload with "name": selected_agent_name, so a payload/URL mismatch
+    can't occur from this UI and isn't re-checked here.
+    """
+    return _api("PUT", "/agents/" + quote(agent_name), **_json_kwargs(agent_config))
 
 def update_tool(tool_name, tool_code):
     """Updates an existing tool (specifically its code) via the API. Returns True on success."""
     try:
-        # API expects name and code in the payload for PUT
-        payload = {"name": tool_name, "code": tool_code}
         # Note: API endpoint uses 'function_name' path parameter
-        response = requests.put(f"{API_BASE_URL}/tools/{tool_name}", json=payload)
-        if response.status_code == 200:
-            # st.success(f"Tool '{tool_name}' updated successfully!") # Moved
-            return True
-        else:
-            handle_api_response(response) # Display error via helper
-            return False
+        return _check(_send_tool_code("PUT", _TOOLS_URL + "/" + quote(tool_name), tool_name, tool_code), (200,))
     except requests.exceptions.RequestException as e:
         st.error(f"Connection Error updating tool {tool_name}: {e}")
         return False
 
 def delete_agent(agent_name):
-    """Deletes an agent via the API."""
-    try:
-        response = requests.delete(f"{API_BASE_URL}/agents/{agent_name}")
-        if response.status_code == 200: # OK
-             st.success(f"Agent '{agent_name}' deleted successfully!")
-             return True
-        # Handle cases where deletion might result in 204 No Content as success
-        elif response.status_code == 204:
-             st.success(f"Agent '{agent_name}' deleted successfully!")
-             return True
-        else:
-            handle_api_response(response) # Display error via helper
-            return False
-    except requests.exceptions.RequestException as e:
-        st.error(f"Connection Error deleting agent {agent_name}: {e}")
-        return False
+    """Deletes an agent via the API. 204 No Content also counts as success."""
+    return _api("DELETE", "/agents/" + quote(agent_name), expect=(200, 204))
 
 def delete_tool(tool_name):
-    """Deletes a tool via the API."""
+    """Deletes a tool via the API. 204 No Content also counts as success."""
+    # Note: API endpoint uses 'function_name' path parameter
+    return _api("DELETE", "/tools/" + quote(tool_name), expect=(200, 204))
+
+def _sorted_options(kind, names, create_label):
+    """
+    Builds the selectbox options for a name list, re-sorting only when the
+    list actually changed since the last rerun (version tracked per
+    section in st.session_state).
+    """
+    version = tuple(names)
+    if st.session_state.get(f"{kind}_version") != version:
+        st.session_state[f"{kind}_version"] = version
+        st.session_state[f"{kind}_sorted"] = [create_label] + sorted(version)
+    return st.session_state[f"{kind}_sorted"]
+
+@st.cache_resource
+def _ace_defaults():
+    """Editor settings shared by the create and update tool forms."""
+    return {
+        "language": "python",
+        "theme": "tomorrow_night",
+        "height": 300,
+        "auto_update": True, # Update value on change
+    }
+
+# st.fragment became stable in Streamlit 1.37; fall back to the experimental
+# name (or a no-op decorator) so the app still runs on older installs.
+_fragment = getattr(st, "fragment", getattr(st, "experimental_fragment", lambda f: f))
+
+def _rerun_fragment():
+    """Reruns only the enclosing fragment; falls back to a full rerun on
+    Streamlit versions whose st.rerun has no scope parameter."""
     try:
-        # Note: API endpoint uses 'function_name' path parameter
-        response = requests.delete(f"{API_BASE_URL}/tools/{tool_name}")
-        if response.status_code == 200: # OK
-             st.success(f"Tool '{tool_name}' deleted successfully!")
-             return True
-        # Handle cases where deletion might result in 204 No Content as success
-        elif response.status_code == 204:
-             st.success(f"Tool '{tool_name}' deleted successfully!")
-             return True
-        else:
-            handle_api_response(response) # Display error via helper
-            return False
-    except requests.exceptions.RequestException as e:
-        st.error(f"Connection Error deleting tool {tool_name}: {e}")
-        return False
+        st.rerun(scope="fragment")
+    except TypeError:
+        st.rerun()
+
+# Tool sources past this size stream to the browser in chunks instead of
+# rendering as one blocking st.code block (mirrors the API's 64 KB cutoff)
+_CODE_STREAM_THRESHOLD = 64 * 1024
+_CODE_CHUNK = 2048
+
+def _render_tool_code(code):
+    """Shows a tool's source. Small sources get the usual highlighted
+    st.code block; large ones stream inside a single markdown fence so the
+    first screenful paints while the rest is still arriving."""
+    if len(code) <= _CODE_STREAM_THRESHOLD or not hasattr(st, "write_stream"):
+        st.code(code, language='python')
+        return
+
+    def _chunks():
+        yield "```python\n"
+        for i in range(0, len(code), _CODE_CHUNK):
+            yield code[i:i + _CODE_CHUNK]
+        yield "\n```"
+
+    st.write_stream(_chunks)
+
+def _show_pending_success():
+    """Displays (and clears) a queued success message inside a fragment.
+    Fragment-scoped reruns skip the banner at the top of the script, so
+    each detail view surfaces the message itself."""
+    if 'success_message' in st.session_state:
+        st.success(st.session_state['success_message'])
+        del st.session_state['success_message']
+
+@_fragment
+def agent_detail_view(selected_agent_name):
+    """Details / update / delete view for one agent. Runs as a fragment, so
+    submitting the update form reruns only this subtree — the agent and tool
+    list fetches at the top of the script are skipped."""
+    _show_pending_success()
+    st.subheader(f"Details for Agent: {selected_agent_name}")
+    # Details and the tool list are independent; fetch them in parallel.
+    # The page-data tools (5s TTL) are used here since the update form
+    # pre-selects against them.
+    agent_details, available_tools = get_agent_page_data(selected_agent_name)
+    if agent_details:
+        st.subheader("Current Configuration")
+        st.json(agent_details)
+
+        # --- Chat Button ---
+        chat_url = f"http://localhost:8000/dev-ui?app={selected_agent_name}"
+        st.link_button("Chat with this Agent", url=chat_url, type="primary")
+        st.write("---") # Separator
+
+        st.subheader("Update Agent")
+        # Use a unique key based on the agent name to avoid state issues if the selection changes
+        with st.form(f"update_agent_{selected_agent_name}_form"):
+            # Pre-fill form with existing details
+            # Name might be read-only depending on API capability/design choice
+            # st.text_input("Agent Name (Read-Only)", value=agent_details.get("name"), key=f"update_agent_name_{selected_agent_name}", disabled=True)
+            updated_model = st.text_input("Model", value=agent_details.get("model", "gpt-4"), key=f"update_agent_model_{selected_agent_name}")
+            updated_description = st.text_input("Description", value=agent_details.get("description", ""), key=f"update_agent_desc_{selected_agent_name}")
+            updated_instruction = st.text_area("Instruction*", value=agent_details.get("instruction", ""), height=200, key=f"update_agent_instruction_{selected_agent_name}")
+
+            # Pre-select current tools. Intersect against the catalog with a
+            # set so stale references are dropped in one O(n+m) pass instead
+            # of the widget's per-default linear scan over the options.
+            available_set = set(available_tools)
+            current_tools = [t for t in agent_details.get("tool_references", []) if t in available_set]
+            updated_tools = st.multiselect(
+                "Select Tools",
+                options=available_tools,
+                default=current_tools,
+                key=f"update_agent_tools_{selected_agent_name}"
+            )
+
+            update_submitted = st.form_submit_button("Update Agent")
+            if update_submitted:
+                if not updated_instruction: # Name is read-only, instruction is key
+                     st.warning("Instruction is a required field.")
+                else:
+                    updated_agent_config = {
+                        "name": selected_agent_name, # Keep original name
+                        "model": updated_model,
+                        "description": updated_description,
+                        "instruction": updated_instruction,
+                        "tool_references": updated_tools
+                    }
+                    if update_agent(selected_agent_name, updated_agent_config):
+                        get_agent_page_data.clear()
+                        st.session_state['success_message'] = f"Agent '{selected_agent_name}' updated successfully!"
+                        _rerun_fragment() # Refresh data and show message; nothing outside changed
+                    # Error handled in update_agent
+
+        st.write("---") # Separator
+
+        # --- Delete Agent Section ---
+        st.subheader("Delete Agent")
+        st.warning(f"**Warning:** Deleting agent '{selected_agent_name}' cannot be undone.")
+        # Use a unique key for the delete button as well
+        if st.button("Delete Agent Permanently", key=f"delete_agent_{selected_agent_name}"):
+            if delete_agent(selected_agent_name):
+                get_agents.clear()
+                get_agent_page_data.clear()
+                st.session_state['success_message'] = f"Agent '{selected_agent_name}' deleted successfully!"
+                st.rerun() # Full rerun: the agent selectbox outside this fragment must refresh
+            # Error handled in delete_agent
+
+    else:
+        st.warning(f"Could not retrieve details for agent '{selected_agent_name}'. It might have been deleted.")
+
+@_fragment
+def tool_detail_view(selected_tool_name):
+    """Details / update / delete view for one tool. Runs as a fragment, so
+    submitting the code editor form reruns only this subtree."""
+    _show_pending_success()
+    st.subheader(f"Details for Tool: {selected_tool_name}")
+    tool_details = get_tool_details(selected_tool_name)
+    if tool_details:
+        st.subheader("Current Code")
+        # Display name, but don't make it an input field for update
+        st.text(f"Name: {tool_details.get('name', 'N/A')}")
+        _render_tool_code(tool_details.get('code', '# No code found'))
+
+        st.subheader("Update Tool Code")
+        # Use a unique key based on the tool name
+        with st.form(f"update_tool_{selected_tool_name}_form"):
+             # Name is usually not updatable via PUT code endpoint, treat as read-only display
+             st.text(f"Updating code for: {selected_tool_name}")
+             # Replace st.text_area with st_ace, pre-filled with current code
+             updated_tool_code = st_ace(
+                 value=tool_details.get('code', ''),
+                 key=f"update_tool_code_ace_{selected_tool_name}", # Unique key keeps widget state per tool
+                 **_ace_defaults()
+             )
+
+             update_submitted = st.form_submit_button("Update Tool Code")
+             if update_submitted:
+                 if not updated_tool_code:
+                     st.warning("Tool Code is required.")
+                 else:
+                     if update_tool(selected_tool_name, updated_tool_code):
+                         get_tool_details.clear()
+                         st.session_state['success_message'] = f"Tool '{selected_tool_name}' updated successfully!"
+                         _rerun_fragment() # Refresh data and show message; the tool list is unchanged
+                     # Error handled in update_tool
+
+        st.write("---") # Separator
+
+        # --- Delete Tool Section ---
+        st.subheader("Delete Tool")
+        st.warning(f"**Warning:** Deleting tool '{selected_tool_name}' cannot be undone. This might break agents using this tool.")
+        # Use a unique key for the delete button
+        if st.button("Delete Tool Permanently", key=f"delete_tool_{selected_tool_name}"):
+            if delete_tool(selected_tool_name):
+                get_tools.clear()
+                get_tool_details.clear()
+                get_agent_page_data.clear()
+                st.session_state['success_message'] = f"Tool '{selected_tool_name}' deleted successfully!"
+                st.rerun() # Full rerun: the tool selectbox outside this fragment must refresh
+            # Error handled in delete_tool
+
+    else:
+         st.warning(f"Could not retrieve details for tool '{selected_tool_name}'. It might have been deleted.")
 
 # --- UI Rendering ---
 st.set_page_config(layout="wide") # Use wide layout for better space utilization
@@ -231,7 +490,10 @@ if section == "Agent Management":
     st.header("Agent Management")
 
     agent_names = get_agents()
-    agent_options = ["--- Create New Agent ---"] + sorted(agent_names) # Add create option and sort
+    # Fetched once per render and reused below; with the 30s cache this is
+    # usually an in-memory hit that also pre-warms the create form.
+    available_tools = get_tools()
+    agent_options = _sorted_options("agents", agent_names, "--- Create New Agent ---")
 
     selected_agent_name = st.selectbox("Select Agent", options=agent_options)
 
@@ -243,8 +505,6 @@ if section == "Agent Management":
             agent_description = st.text_input("Description", key="create_agent_desc")
             agent_instruction = st.text_area("Instruction*", height=200, key="create_agent_instruction")
 
-            # Fetch available tools for the multiselect
-            available_tools = get_tools()
             selected_tools = st.multiselect(
                 "Select Tools",
                 options=available_tools,
@@ -264,80 +524,25 @@ if section == "Agent Management":
                         "tool_references": selected_tools
                     }
                     if create_agent(agent_config):
+                        get_agents.clear()
                         st.session_state['success_message'] = f"Agent '{agent_name}' created successfully!"
                         st.rerun() # Rerun to show message and update list
                     # Error is handled within create_agent
 
     elif selected_agent_name:
-        st.subheader(f"Details for Agent: {selected_agent_name}")
-        agent_details = get_agent_details(selected_agent_name)
-        if agent_details:
-            st.subheader("Current Configuration")
-            st.json(agent_details)
-
-            # --- Chat Button ---
-            chat_url = f"http://localhost:8000/dev-ui?app={selected_agent_name}"
-            st.link_button("Chat with this Agent", url=chat_url, type="primary")
-            st.write("---") # Separator
-
-            st.subheader("Update Agent")
-            # Use a unique key based on the agent name to avoid state issues if the selection changes
-            with st.form(f"update_agent_{selected_agent_name}_form"):
-                # Pre-fill form with existing details
-                # Name might be read-only depending on API capability/design choice
-                # st.text_input("Agent Name (Read-Only)", value=agent_details.get("name"), key=f"update_agent_name_{selected_agent_name}", disabled=True)
-                updated_model = st.text_input("Model", value=agent_details.get("model", "gpt-4"), key=f"update_agent_model_{selected_agent_name}")
-                updated_description = st.text_input("Description", value=agent_details.get("description", ""), key=f"update_agent_desc_{selected_agent_name}")
-                updated_instruction = st.text_area("Instruction*", value=agent_details.get("instruction", ""), height=200, key=f"update_agent_instruction_{selected_agent_name}")
-
-                available_tools = get_tools()
-                # Pre-select current tools
-                current_tools = agent_details.get("tool_references", [])
-                updated_tools = st.multiselect(
-                    "Select Tools",
-                    options=available_tools,
-                    default=current_tools,
-                    key=f"update_agent_tools_{selected_agent_name}"
-                )
-
-                update_submitted = st.form_submit_button("Update Agent")
-                if update_submitted:
-                    if not updated_instruction: # Name is read-only, instruction is key
-                         st.warning("Instruction is a required field.")
-                    else:
-                        updated_agent_config = {
-                            "name": selected_agent_name, # Keep original name
-                            "model": updated_model,
-                            "description": updated_description,
-                            "instruction": updated_instruction,
-                            "tool_references": updated_tools
-                        }
-                        if update_agent(selected_agent_name, updated_agent_config):
-                            st.session_state['success_message'] = f"Agent '{selected_agent_name}' updated successfully!"
-                            st.rerun() # Refresh data and show message
-                        # Error handled in update_agent
-
-            st.write("---") # Separator
-
-            # --- Delete Agent Section ---
-            st.subheader("Delete Agent")
-            st.warning(f"**Warning:** Deleting agent '{selected_agent_name}' cannot be undone.")
-            # Use a unique key for the delete button as well
-            if st.button("Delete Agent Permanently", key=f"delete_agent_{selected_agent_name}"):
-                if delete_agent(selected_agent_name):
-                    st.session_state['success_message'] = f"Agent '{selected_agent_name}' deleted successfully!"
-                    st.rerun() # Refresh the page to update the list and show message
-                # Error handled in delete_agent
-
-        else:
-            st.warning(f"Could not retrieve details for agent '{selected_agent_name}'. It might have been deleted.")
+        agent_detail_view(selected_agent_name)
 
 
 elif section == "Tool Management":
+    # Imported here rather than at module top so agent-only sessions skip the
+    # editor component entirely; sys.modules makes reruns after the first free.
+    # Binding at top-level code is module-global, so tool_detail_view sees it.
+    from streamlit_ace import st_ace
+
     st.header("Tool Management")
 
     tool_names = get_tools()
-    tool_options = ["--- Create New Tool ---"] + sorted(tool_names) # Add create option and sort
+    tool_options = _sorted_options("tools", tool_names, "--- Create New Tool ---")
 
     selected_tool_name = st.selectbox("Select Tool", options=tool_options)
 
@@ -347,11 +552,8 @@ elif section == "Tool Management":
             tool_name = st.text_input("Tool Name*", key="create_tool_name")
             # Replace st.text_area with st_ace
             tool_code = st_ace(
-                language="python",
-                theme="tomorrow_night", # Example theme, many available
                 key="create_tool_code_ace",
-                height=300,
-                auto_update=True # Update value on change
+                **_ace_defaults()
             )
 
             submitted = st.form_submit_button("Create Tool")
@@ -360,58 +562,14 @@ elif section == "Tool Management":
                     st.warning("Tool Name and Code are required fields.")
                 else:
                     if create_tool(tool_name, tool_code):
+                        get_tools.clear()
+                        get_agent_page_data.clear()
                         st.session_state['success_message'] = f"Tool '{tool_name}' created successfully!"
                         st.rerun() # Rerun to update the selectbox and show message
                     # Error is handled within create_tool
 
     elif selected_tool_name:
-        st.subheader(f"Details for Tool: {selected_tool_name}")
-        tool_details = get_tool_details(selected_tool_name)
-        if tool_details:
-            st.subheader("Current Code")
-            # Display name, but don't make it an input field for update
-            st.text(f"Name: {tool_details.get('name', 'N/A')}")
-            st.code(tool_details.get('code', '# No code found'), language='python')
-
-            st.subheader("Update Tool Code")
-            # Use a unique key based on the tool name
-            with st.form(f"update_tool_{selected_tool_name}_form"):
-                 # Name is usually not updatable via PUT code endpoint, treat as read-only display
-                 st.text(f"Updating code for: {selected_tool_name}")
-                 # Replace st.text_area with st_ace, pre-filled with current code
-                 updated_tool_code = st_ace(
-                     value=tool_details.get('code', ''),
-                     language="python",
-                     theme="tomorrow_night", # Use the same theme
-                     key=f"update_tool_code_ace_{selected_tool_name}", # Unique key
-                     height=300,
-                     auto_update=True # Update value on change
-                 )
-
-                 update_submitted = st.form_submit_button("Update Tool Code")
-                 if update_submitted:
-                     if not updated_tool_code:
-                         st.warning("Tool Code is required.")
-                     else:
-                         if update_tool(selected_tool_name, updated_tool_code):
-                             st.session_state['success_message'] = f"Tool '{selected_tool_name}' updated successfully!"
-                             st.rerun() # Refresh data and show message
-                         # Error handled in update_tool
-
-            st.write("---") # Separator
-
-            # --- Delete Tool Section ---
-            st.subheader("Delete Tool")
-            st.warning(f"**Warning:** Deleting tool '{selected_tool_name}' cannot be undone. This might break agents using this tool.")
-            # Use a unique key for the delete button
-            if st.button("Delete Tool Permanently", key=f"delete_tool_{selected_tool_name}"):
-                if delete_tool(selected_tool_name):
-                    st.session_state['success_message'] = f"Tool '{selected_tool_name}' deleted successfully!"
-                    st.rerun() # Refresh the page to update the list and show message
-                # Error handled in delete_tool
-
-        else:
-             st.warning(f"Could not retrieve details for tool '{selected_tool_name}'. It might have been deleted.")
+        tool_detail_view(selected_tool_name)
 
 
 # --- Helper Functions (e.g., for refreshing lists) ---